@@ -0,0 +1 @@
+# Marks benchmarks as a package.
@@ -0,0 +1,77 @@
+"""
+Seeding a year of budgets for N categories: one upsert_budget call per row
+vs. a single bulk_upsert_budgets call.
+
+Requires a reachable MongoDB:
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_budget_bulk \
+        --categories 30 --months 12
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+BENCH_USER = "bench-user"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="category_budget_bench")
+    parser.add_argument("--categories", type=int, default=30)
+    parser.add_argument("--months", type=int, default=12)
+    args = parser.parse_args()
+
+    os.environ["MONGODB_URI"] = args.uri
+    os.environ["MONGODB_DB"] = args.db
+    from db.database import close_client, get_db
+    from db.indexes import apply_migrations
+    from models.budget_model import BudgetRequest
+    from services.budget_service import BudgetService
+
+    db = get_db()
+    await apply_migrations(db)
+    await db["category_data"].delete_many({"user_id": BENCH_USER})
+    now = datetime.now()
+    res = await db["category_data"].insert_many([
+        {"user_id": BENCH_USER, "name": f"cat-{i:03d}", "items": [], "created_at": now, "updated_at": now}
+        for i in range(args.categories)
+    ])
+    rows = [
+        {"month": f"2024-{m + 1:02d}", "category_id": str(cid), "limit": 100.0}
+        for cid in res.inserted_ids
+        for m in range(args.months)
+    ]
+
+    async def single_rows():
+        service = BudgetService()
+        for row in rows:
+            await service.upsert_budget(BENCH_USER, BudgetRequest(**row))
+
+    async def bulk():
+        async def stream():
+            for row in rows:
+                yield row
+
+        report = await BudgetService().bulk_upsert_budgets(BENCH_USER, stream())
+        assert report["error"] == 0, report
+
+    results = {"rows": len(rows)}
+    for name, fn in (("single_row_upserts", single_rows), ("bulk_upsert", bulk)):
+        await db["budget_data"].delete_many({"user_id": BENCH_USER})
+        start = time.perf_counter()
+        await fn()
+        elapsed = time.perf_counter() - start
+        results[name] = {"elapsed_ms": round(elapsed * 1000, 2), "rows_per_s": round(len(rows) / elapsed, 1)}
+
+    await db["budget_data"].delete_many({"user_id": BENCH_USER})
+    await db["category_data"].delete_many({"user_id": BENCH_USER})
+    await close_client()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,136 @@
+"""
+Budget upserts per second under concurrency: the previous four-round-trip
+implementation (category find_one, budget find_one, update/insert, version
+bump) vs. the current three (category find_one, find_one_and_update, version
+bump). The ownership check and the version bump live in other collections,
+so they stay separate round trips; the bump has to follow the write for the
+listing ETag to stay correct. Also races concurrent upserts on one
+(user_id, month, category_id) key and exits non-zero if duplicates appear.
+
+Requires a reachable MongoDB:
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_budget_upsert \
+        --concurrency 50 --requests 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+BENCH_USER = "bench-user"
+
+
+async def _legacy_upsert(budgets, categories, versions, user_id: str, payload):
+    from bson import ObjectId
+
+    cat = await categories.find_one({"_id": ObjectId(payload.category_id), "user_id": user_id})
+    if not cat:
+        raise ValueError("Category not found")
+    query = {"user_id": user_id, "month": payload.month, "category_id": payload.category_id}
+    now = datetime.now()
+    existing = await budgets.find_one(query)
+    if existing:
+        await budgets.update_one(
+            {"_id": existing["_id"]},
+            {"$set": {"limit": float(payload.limit), "updated_at": now}},
+        )
+        budget_id = existing["_id"]
+    else:
+        res = await budgets.insert_one({**query, "limit": float(payload.limit), "created_at": now, "updated_at": now})
+        budget_id = res.inserted_id
+    await versions.bump(user_id, "budgets")
+    return str(budget_id)
+
+
+async def _drive(op, total: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with sem:
+            try:
+                await op(i)
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "upserts_per_s": round(total / elapsed, 1),
+    }
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="category_budget_bench")
+    parser.add_argument("--categories", type=int, default=30)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--racers", type=int, default=100)
+    args = parser.parse_args()
+
+    os.environ["MONGODB_URI"] = args.uri
+    os.environ["MONGODB_DB"] = args.db
+    from db.database import close_client, get_db
+    from db.indexes import apply_migrations
+    from models.budget_model import BudgetRequest
+    from services.budget_service import BudgetService
+    from services.user_versions import UserVersions
+
+    db = get_db()
+    await apply_migrations(db)
+    await db["budget_data"].delete_many({"user_id": BENCH_USER})
+    await db["category_data"].delete_many({"user_id": BENCH_USER})
+    now = datetime.now()
+    res = await db["category_data"].insert_many([
+        {"user_id": BENCH_USER, "name": f"cat-{i:03d}", "items": [], "created_at": now, "updated_at": now}
+        for i in range(args.categories)
+    ])
+    category_ids = [str(oid) for oid in res.inserted_ids]
+
+    def payload(i: int) -> BudgetRequest:
+        month = f"{2000 + (i // 12) % 50}-{i % 12 + 1:02d}"
+        return BudgetRequest(month=month, category_id=category_ids[i % len(category_ids)], limit=100 + i)
+
+    service = BudgetService()
+    results = {
+        "before_four_round_trips": await _drive(
+            lambda i: _legacy_upsert(db["budget_data"], db["category_data"], UserVersions(db), BENCH_USER, payload(i)),
+            args.requests, args.concurrency,
+        ),
+        "after_three_round_trips": await _drive(
+            lambda i: service.upsert_budget(BENCH_USER, payload(i)),
+            args.requests, args.concurrency,
+        ),
+    }
+
+    race_payload = BudgetRequest(month="1999-01", category_id=category_ids[0], limit=1)
+    race = await asyncio.gather(
+        *(BudgetService().upsert_budget(BENCH_USER, race_payload) for _ in range(args.racers)),
+        return_exceptions=True,
+    )
+    documents = await db["budget_data"].count_documents(
+        {"user_id": BENCH_USER, "month": "1999-01", "category_id": category_ids[0]}
+    )
+    results["race"] = {
+        "racers": args.racers,
+        "errors": sum(isinstance(r, Exception) for r in race),
+        "created_responses": sum(isinstance(r, dict) and "created" in r["message"] for r in race),
+        "documents_for_key": documents,
+    }
+    await close_client()
+    print(json.dumps(results, indent=2))
+    return 0 if documents == 1 and results["race"]["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,124 @@
+"""
+Latency of POST /categories/create as the number of distinct expense
+descriptions grows: the previous per-description find_one loop vs. the
+current single $in lookup + insert_many. The expense fetch is replaced by a
+synthetic list so only the Mongo work is measured.
+
+Requires a reachable MongoDB:
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_create_category \
+        --descriptions 10 100 1000
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+BENCH_USER = "bench-user"
+
+
+def _expenses(descriptions: int) -> list[dict]:
+    return [
+        {
+            "description": f"desc-{i:05d}",
+            "items": [{"item_id": f"{i}", "item_name": "item", "item_price": 1.0, "item_quantity": 1}],
+        }
+        for i in range(descriptions)
+    ]
+
+
+async def _legacy_extra_lookup(col, user_id: str, name: str, expenses: list[dict]):
+    # The pre-change loop: one find_one per distinct description.
+    seen = set()
+    extra = []
+    for exp in expenses:
+        desc = exp["description"]
+        if desc == name or desc in seen:
+            continue
+        seen.add(desc)
+        if not await col.find_one({"user_id": user_id, "name": desc}):
+            extra.append({"user_id": user_id, "name": desc, "items": exp["items"]})
+    await col.insert_one({"user_id": user_id, "name": name, "items": []})
+    if extra:
+        await col.insert_many(extra, ordered=False)
+
+
+async def _timed(fn, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "runs": runs,
+        "mean_ms": round(statistics.mean(samples), 2),
+        "p50_ms": round(statistics.median(samples), 2),
+        "max_ms": round(max(samples), 2),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="category_budget_bench")
+    parser.add_argument("--descriptions", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["MONGODB_URI"] = args.uri
+    os.environ["MONGODB_DB"] = args.db
+    from db.database import close_client, get_db
+    from db.indexes import apply_migrations
+    from models.category_model import CategoryRequest
+    from services.category_service import CategoryService
+
+    db = get_db()
+    col = db["category_data"]
+    await apply_migrations(db)
+    service = CategoryService()
+    counter = 0
+    results = []
+
+    for n in args.descriptions:
+        expenses = _expenses(n)
+
+        async def fake_fetch(user_id: str) -> list[dict]:
+            return expenses
+
+        service._fetch_expenses = fake_fetch
+
+        # Half of the descriptions already exist, so both paths take the lookup and the insert branch.
+        async def reset():
+            await col.delete_many({"user_id": BENCH_USER})
+            await col.insert_many([
+                {"user_id": BENCH_USER, "name": exp["description"], "items": []}
+                for exp in expenses[: n // 2]
+            ])
+
+        async def legacy():
+            nonlocal counter
+            await reset()
+            counter += 1
+            await _legacy_extra_lookup(col, BENCH_USER, f"new-{counter}", expenses)
+
+        async def current():
+            nonlocal counter
+            await reset()
+            counter += 1
+            await service.create_category(BENCH_USER, CategoryRequest(name=f"new-{counter}"))
+
+        results.append({
+            "descriptions": n,
+            "before_find_one_per_description": await _timed(legacy, args.runs),
+            "after_single_in_query": await _timed(current, args.runs),
+        })
+
+    await col.delete_many({"user_id": BENCH_USER})
+    await close_client()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Microbenchmark of grouping expense items by description: the previous
+`current + raw_items` concatenation with per-item dict copies vs.
+ExpenseItemMerger. Pure CPU, no MongoDB needed:
+
+    python -m benchmarks.bench_item_merge --items 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+
+def _expenses(total_items: int, items_per_expense: int, descriptions: int) -> list[dict]:
+    expenses = []
+    for e in range(max(1, total_items // items_per_expense)):
+        expenses.append({
+            "description": f"desc-{e % descriptions}",
+            "items": [
+                {"item_id": f"{e}-{i}", "item_name": "item", "item_price": 1.0, "item_quantity": 1}
+                for i in range(items_per_expense)
+            ],
+        })
+    return expenses
+
+
+def _legacy_group(expenses: list[dict]) -> dict[str, list[dict]]:
+    grouped: dict[str, list[dict]] = {}
+    for exp in expenses:
+        desc = exp.get("description", "").strip()
+        if desc:
+            current = grouped.get(desc, [])
+            now_iso = datetime.now().isoformat()
+            raw_items = [
+                {**it, "created_at": now_iso} if isinstance(it, dict) and "created_at" not in it else it
+                for it in exp.get("items", []) or []
+            ]
+            grouped[desc] = current + raw_items
+    return grouped
+
+
+def _best_of(fn, build, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # Fresh payload per run (the merger fills created_at in place); built outside the timer.
+        payload = build()
+        start = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--items-per-expense", type=int, default=5)
+    parser.add_argument("--descriptions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # Importing the service module creates a (lazy, unconnected) Mongo client.
+    os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+    os.environ.setdefault("MONGODB_DB", "category_budget_bench")
+    from services.category_service import ExpenseItemMerger
+
+    results = []
+    for n in args.items:
+        def build():
+            return _expenses(n, args.items_per_expense, args.descriptions)
+
+        results.append({
+            "items": n,
+            "before_concat_ms": round(_best_of(_legacy_group, build, args.repeat), 2),
+            "after_merger_ms": round(_best_of(ExpenseItemMerger().group, build, args.repeat), 2),
+            "after_merger_dedupe_ms": round(_best_of(ExpenseItemMerger(dedupe=True).group, build, args.repeat), 2),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
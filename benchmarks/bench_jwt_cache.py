@@ -0,0 +1,60 @@
+"""
+Per-request auth overhead of the verify_jwt_token dependency with the
+verified-token cache on and off. Pure CPU, no MongoDB needed:
+
+    python -m benchmarks.bench_jwt_cache --requests 50000 --tokens 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+import jwt
+
+
+async def _run(service, headers: list[str], requests: int) -> dict:
+    import routers.auth_dependency as auth
+
+    auth.jwt_service = service
+    start = time.perf_counter()
+    for i in range(requests):
+        await auth.verify_jwt_token(headers[i % len(headers)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "us_per_request": round(elapsed / requests * 1e6, 2),
+        "cache": service.cache_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--tokens", type=int, default=100, help="distinct tokens (simulated client sessions)")
+    args = parser.parse_args()
+
+    from services.jwt_service import JWTService
+
+    secret = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
+    exp = int(time.time()) + 3600
+    headers = [
+        "Bearer " + jwt.encode({"sub": f"user-{i}", "username": f"user-{i}", "type": "access", "exp": exp},
+                               secret, algorithm="HS256")
+        for i in range(args.tokens)
+    ]
+
+    os.environ["JWT_CACHE_MAX_ENTRIES"] = "0"
+    uncached = JWTService()
+    os.environ["JWT_CACHE_MAX_ENTRIES"] = str(max(args.tokens, 1) * 2)
+    cached = JWTService()
+
+    results = {
+        "cache_off": asyncio.run(_run(uncached, headers, args.requests)),
+        "cache_on": asyncio.run(_run(cached, headers, args.requests)),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Throughput of the category listing query under concurrency: blocking pymongo
+calls inside async handlers (old data path) vs. AsyncMongoClient (current).
+
+Requires a reachable MongoDB:
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_mongo_async \
+        --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+from pymongo import AsyncMongoClient, MongoClient
+
+BENCH_USER = "bench-user"
+
+
+async def _loop_lag_probe(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def _drive(op, total: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_loop_lag_probe(stop))
+
+    async def one():
+        async with sem:
+            await op()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    max_lag = await probe
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(total / elapsed, 1),
+        "max_loop_lag_ms": round(max_lag * 1000, 2),
+    }
+
+
+def _seed(uri: str, db_name: str, categories: int):
+    col = MongoClient(uri)[db_name]["category_data"]
+    col.delete_many({"user_id": BENCH_USER})
+    now = datetime.now()
+    col.insert_many([
+        {"user_id": BENCH_USER, "name": f"cat-{i:05d}", "items": [], "created_at": now, "updated_at": now}
+        for i in range(categories)
+    ])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="category_budget_bench")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    _seed(args.uri, args.db, args.categories)
+    query = {"user_id": BENCH_USER}
+
+    sync_col = MongoClient(args.uri, maxPoolSize=args.concurrency)[args.db]["category_data"]
+
+    async def blocking_op():
+        list(sync_col.find(query).sort("name", 1))
+
+    async_client = AsyncMongoClient(args.uri, maxPoolSize=args.concurrency)
+    async_col = async_client[args.db]["category_data"]
+
+    async def async_op():
+        await async_col.find(query).sort("name", 1).to_list()
+
+    await async_op()
+    results = {
+        "before_blocking_pymongo": await _drive(blocking_op, args.requests, args.concurrency),
+        "after_async_pymongo": await _drive(async_op, args.requests, args.concurrency),
+    }
+    await async_client.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""
+Serialization cost of a category listing with one large category: the
+previous plain-dict path (jsonable_encoder + JSONResponse) vs. validating
+and dumping through the declared response model, which is what FastAPI
+does for routes with a response_model. Pure CPU, no MongoDB needed:
+
+    python -m benchmarks.bench_serialization --items 1000 10000
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from models.category_model import CategoryResponse
+
+
+def _categories(items: int) -> list[dict]:
+    now = datetime.now()
+    return [{
+        "category_id": "65f000000000000000000000",
+        "name": "groceries",
+        "items": [
+            {
+                "item_id": f"item-{i}",
+                "item_name": f"item {i}",
+                "item_price": 1.25 + i % 100,
+                "item_quantity": 1 + i % 5,
+                "created_at": now.isoformat(),
+            }
+            for i in range(items)
+        ],
+        "item_count": items,
+        "created_at": now,
+        "updated_at": now,
+    }]
+
+
+def _best_of(fn, payload, repeat: int) -> tuple[float, int]:
+    best, size = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(payload)
+        best = min(best, time.perf_counter() - start)
+        size = len(body)
+    return best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[CategoryResponse])
+
+    def plain_dicts(payload):
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def response_model(payload):
+        return adapter.dump_json(adapter.validate_python(payload))
+
+    results = {}
+    for items in args.items:
+        payload = _categories(items)
+        row = {}
+        for name, fn in (("jsonable_encoder", plain_dicts), ("response_model", response_model)):
+            elapsed, size = _best_of(fn, payload, args.repeat)
+            row[name] = {"ms": round(elapsed * 1000, 3), "bytes": size}
+        row["speedup"] = round(row["jsonable_encoder"]["ms"] / row["response_model"]["ms"], 1)
+        results[str(items)] = row
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
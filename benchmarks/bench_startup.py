@@ -0,0 +1,113 @@
+"""
+Startup cost: how long `import server` takes, and how long a fresh app
+process needs until /healthz answers, until /readyz reports ready and until
+the first authenticated `GET /{user_id}/categories` succeeds. Each startup
+is measured with and without the warm-up step (STARTUP_WARMUP).
+
+    python -m benchmarks.bench_startup --runs 5
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_startup --runs 5
+
+Without --uri the app runs on the mongomock-motor stand-in (see
+benchmarks/load_test.py), so warm-up has no real pool to open.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import load_test
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+
+
+def measure_import(args) -> list[float]:
+    env = {
+        **os.environ,
+        "MONGODB_URI": args.uri if args.uri != load_test.MEMORY_URI else "mongodb://127.0.0.1:1",
+        "MONGODB_DB": args.db,
+        "RABBITMQ_LOG_SPOOL_DIR": "",
+    }
+    timings = []
+    for _ in range(args.runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET], env=env, capture_output=True, text=True, check=True,
+        )
+        timings.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return timings
+
+
+async def _until(client, url: str, start: float, headers=None, timeout: float = 30.0) -> float:
+    while time.perf_counter() - start < timeout:
+        try:
+            if (await client.get(url, headers=headers)).status_code == 200:
+                return (time.perf_counter() - start) * 1000
+        except Exception:
+            pass
+        await asyncio.sleep(0.005)
+    raise RuntimeError(f"{url} did not answer 200 within {timeout:.0f}s")
+
+
+async def _probe(args, start: float) -> dict:
+    import httpx
+
+    user_id = "startup-user"
+    headers = {"Authorization": f"Bearer {load_test._token(user_id, args.jwt_secret)}"}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.app_port}", timeout=10) as client:
+        return {
+            "healthz_ms": await _until(client, "/healthz", start),
+            "readyz_ms": await _until(client, "/readyz", start),
+            "first_request_ms": await _until(client, f"/{user_id}/categories", start, headers),
+        }
+
+
+def measure_startup(args, warmup: bool) -> list[dict]:
+    os.environ["STARTUP_WARMUP"] = "true" if warmup else "false"
+    args.expense_port = load_test._free_port()
+    expenses = load_test._spawn(args, "expenses")
+    runs = []
+    try:
+        for _ in range(args.runs):
+            args.app_port = load_test._free_port()
+            start = time.perf_counter()
+            app = load_test._spawn(args, "app")
+            try:
+                runs.append(asyncio.run(_probe(args, start)))
+            finally:
+                app.terminate()
+                app.wait(timeout=10)
+    finally:
+        expenses.terminate()
+        expenses.wait(timeout=10)
+    return runs
+
+
+def _summary(values: list[float]) -> dict:
+    return {"median": round(statistics.median(values), 2), "min": round(min(values), 2), "max": round(max(values), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+        parents=[load_test.build_parser()], conflict_handler="resolve",
+    )
+    parser.add_argument("--db", default="category_budget_startup")
+    parser.add_argument("--runs", type=int, default=5, help="process starts per measurement")
+    args = parser.parse_args()
+    args.workers = 1
+
+    report = {"commit": load_test._commit(), "uri": "memory" if args.uri == load_test.MEMORY_URI else "mongodb",
+              "runs": args.runs, "import_ms": _summary(measure_import(args))}
+    for warmup in (False, True):
+        runs = measure_startup(args, warmup)
+        report["warmup" if warmup else "no_warmup"] = {
+            key: _summary([r[key] for r in runs]) for key in ("healthz_ms", "readyz_ms", "first_request_ms")
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
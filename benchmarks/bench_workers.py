@@ -0,0 +1,43 @@
+"""
+Throughput scaling with the number of worker processes: runs the load test
+(benchmarks/load_test.py) against `server.py --workers N` for each N and
+reports requests/s per route and in total.
+
+Requires a reachable MongoDB shared by all workers:
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.bench_workers \
+        --worker-counts 1 2 4 --concurrency 64 --requests 1000
+"""
+import argparse
+import json
+
+from benchmarks import load_test
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+        parents=[load_test.build_parser()], conflict_handler="resolve",
+    )
+    parser.add_argument("--worker-counts", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    results = {}
+    for workers in args.worker_counts:
+        args.workers = workers
+        args.app_port = args.expense_port = 0
+        report = load_test.run(args)
+        routes = report["routes"]
+        results[str(workers)] = {
+            "total_rps": round(sum(r["throughput_rps"] for r in routes.values()), 1),
+            "routes_rps": {name: r["throughput_rps"] for name, r in routes.items()},
+            "p99_ms": {name: r["p99_ms"] for name, r in routes.items()},
+        }
+    base = results[str(args.worker_counts[0])]["total_rps"] or 1
+    for row in results.values():
+        row["speedup"] = round(row["total_rps"] / base, 2)
+    print(json.dumps({"commit": load_test._commit(), "workers": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
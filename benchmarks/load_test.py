@@ -0,0 +1,416 @@
+"""
+End-to-end load test: starts the app from server.py and a fake soa-expense
+server in child processes, then drives every route in routers/router.py at
+a fixed concurrency and prints per-route p50/p95/p99 latency and throughput
+as JSON.
+
+Against a local MongoDB:
+
+    MONGODB_URI=mongodb://localhost:27017 python -m benchmarks.load_test \
+        --concurrency 32 --requests 500 --expenses 200 --output results.json
+
+Without MongoDB (requires `pip install mongomock-motor`; numbers then only
+reflect the Python side of the app):
+
+    python -m benchmarks.load_test --uri memory
+
+Compare two runs by diffing the JSON files; `commit` records the tree the
+numbers were taken on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+MEMORY_URI = "memory"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def synthetic_expenses(user_id: str, count: int, items: int, descriptions: int) -> list[dict]:
+    return [
+        {
+            "expense_id": f"{user_id}-e{i}",
+            "description": f"desc-{i % descriptions:03d}",
+            "created_at": (datetime(2024, 1, 1) + timedelta(minutes=i)).isoformat(),
+            "items": [
+                {
+                    "item_id": f"{user_id}-e{i}-i{j}",
+                    "item_name": f"item {j}",
+                    "item_price": 1.5 + j,
+                    "item_quantity": 1 + j % 3,
+                    "created_at": "2024-01-01T00:00:00",
+                }
+                for j in range(items)
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def serve_expenses(args):
+    """
+    Fake soa-expense: `GET /{user_id}/expenses` returns a synthetic list,
+    encoded once per user; `?since=` keeps only expenses created at or after it.
+    """
+    from services.expense_sync import watermark_value
+
+    import uvicorn
+    from fastapi import FastAPI, Response
+
+    app = FastAPI()
+    encoded: dict[str, bytes] = {}
+
+    @app.get("/{user_id}/expenses")
+    async def expenses(user_id: str, since: str | None = None):
+        if since is not None:
+            rows = synthetic_expenses(user_id, args.expenses, args.items, args.descriptions)
+            since_value = watermark_value(since)
+            rows = [e for e in rows if watermark_value(e["created_at"]) >= since_value]
+            return Response(json.dumps(rows), media_type="application/json")
+        body = encoded.get(user_id)
+        if body is None:
+            body = encoded[user_id] = json.dumps(
+                synthetic_expenses(user_id, args.expenses, args.items, args.descriptions)
+            ).encode("utf-8")
+        return Response(body, media_type="application/json")
+
+    uvicorn.run(app, host="127.0.0.1", port=args.expense_port, log_level="warning")
+
+
+def serve_app(args):
+    import uvicorn
+
+    if args.uri == MEMORY_URI:
+        from mongomock_motor import AsyncMongoMockClient
+        import mongomock.collection
+
+        from db.database import set_client
+
+        # pymongo >= 4.11 passes `sort` to bulk update ops, which mongomock does not accept yet.
+        builder = mongomock.collection.BulkOperationBuilder
+        add_update, add_replace = builder.add_update, builder.add_replace
+
+        def _add_update(self, selector, doc, multi=False, upsert=False, sort=None, **kwargs):
+            return add_update(self, selector, doc, multi, upsert, **kwargs)
+
+        def _add_replace(self, selector, doc, upsert=False, sort=None, **kwargs):
+            return add_replace(self, selector, doc, upsert, **kwargs)
+
+        builder.add_update, builder.add_replace = _add_update, _add_replace
+        client = AsyncMongoMockClient()
+        close = client.close
+
+        async def _close():
+            # The stand-in closes synchronously; db.database.close_client awaits it.
+            close()
+
+        client.close = _close
+        set_client(client)
+
+    from server import app
+
+    uvicorn.run(app, host="127.0.0.1", port=args.app_port, log_level="warning", access_log=False)
+
+
+def _spawn(args, role: str) -> subprocess.Popen:
+    if role == "app" and args.workers > 1:
+        # The real multi-worker entry point; needs MongoDB shared by all workers.
+        cmd = [
+            sys.executable, "server.py", "--host", "127.0.0.1",
+            "--port", str(args.app_port), "--workers", str(args.workers),
+        ]
+    else:
+        cmd = [
+            sys.executable, "-m", "benchmarks.load_test", "--serve", role,
+            "--uri", args.uri, "--db", args.db,
+            "--app-port", str(args.app_port), "--expense-port", str(args.expense_port),
+            "--expenses", str(args.expenses), "--items", str(args.items),
+            "--descriptions", str(args.descriptions),
+        ]
+    env = {
+        **os.environ,
+        "MONGODB_URI": args.uri if args.uri != MEMORY_URI else "mongodb://127.0.0.1:1",
+        "MONGODB_DB": args.db,
+        "MONGODB_AUTO_MIGRATE": "false" if args.uri == MEMORY_URI else "true",
+        "EXPENSE_SERVICE_URL": f"http://127.0.0.1:{args.expense_port}",
+        "JWT_SECRET_KEY": args.jwt_secret,
+        "RABBITMQ_LOG_SPOOL_DIR": "",
+        # A handful of users at high concurrency would mostly measure 429s; set it to test the limiter.
+        "RATE_LIMIT_USER_RPS": os.environ.get("RATE_LIMIT_USER_RPS", "0"),
+    }
+    stderr = None if args.verbose else subprocess.DEVNULL
+    return subprocess.Popen(cmd, env=env, stdout=stderr, stderr=stderr)
+
+
+async def _wait_ready(client, url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def _token(user_id: str, secret: str) -> str:
+    import jwt
+
+    claims = {"sub": user_id, "username": user_id, "type": "access", "exp": int(time.time()) + 3600}
+    return jwt.encode(claims, secret, algorithm="HS256")
+
+
+class Driver:
+    """
+    Runs one scenario per route; each scenario issues `requests` calls with
+    at most `concurrency` in flight, spread round-robin across users.
+    """
+
+    def __init__(self, client, users: list[str], secret: str, concurrency: int, requests: int):
+        self.client = client
+        self.users = users
+        self.headers = {user: {"Authorization": f"Bearer {_token(user, secret)}"} for user in users}
+        self.concurrency = concurrency
+        self.requests = requests
+        self.categories: dict[str, list[str]] = {user: [] for user in users}
+        self.budgets: dict[str, list[tuple[str, str]]] = {user: [] for user in users}
+        self.with_items: dict[str, list[str]] = {user: [] for user in users}
+
+    async def call(self, user: str, method: str, path: str, **kwargs):
+        headers = {**self.headers[user], **kwargs.pop("headers", {})}
+        resp = await self.client.request(method, f"/{user}{path}", headers=headers, **kwargs)
+        resp.raise_for_status()
+        return resp
+
+    async def seed(self, categories: int):
+        """
+        Untimed setup: categories for every user plus enough budgets and
+        spare categories that update/delete scenarios never run dry.
+        """
+        per_user = -(-self.requests // len(self.users))
+        for user in self.users:
+            for i in range(categories + per_user):
+                resp = await self.call(user, "POST", "/categories/create", json={"name": f"seed-{i:05d}"})
+                self.categories[user].append(resp.json()["category_id"]["category_id"])
+            rows = [
+                {"month": f"{2000 + i // 12}-{i % 12 + 1:02d}", "category_id": self.categories[user][0], "limit": 100}
+                for i in range(per_user * 2)
+            ]
+            report = (await self.call(user, "POST", "/budgets/bulk", json=rows)).json()
+            self.budgets[user] = [(row["budget_id"], row["month"]) for row in report["results"] if "budget_id" in row]
+            listing = (await self.call(user, "GET", "/categories")).json()
+            # Categories auto-created from expense descriptions hold the items.
+            self.with_items[user] = [c["category_id"] for c in listing if c["item_count"]] or self.categories[user][:1]
+
+    def scenarios(self) -> dict:
+        ndjson = {"headers": {"Accept": "application/x-ndjson"}}
+
+        def create_category(user, i):
+            return self.call(user, "POST", "/categories/create", json={"name": f"load-{i:06d}"})
+
+        def update_category(user, i):
+            category_id = self.categories[user][i % 8]
+            return self.call(user, "PUT", f"/categories/{category_id}/update", json={"name": f"renamed-{i % 8}"})
+
+        def delete_category(user, i):
+            return self.call(user, "DELETE", f"/categories/{self.categories[user].pop()}/delete")
+
+        def category_items(user, i):
+            category_id = self.with_items[user][i % len(self.with_items[user])]
+            return self.call(user, "GET", f"/categories/{category_id}/items", params={"limit": 100})
+
+        def upsert_budget(user, i):
+            body = {"month": f"2099-{i % 12 + 1:02d}", "category_id": self.categories[user][0], "limit": i + 1}
+            return self.call(user, "POST", "/budgets/upsert", json=body)
+
+        def bulk_budgets(user, i):
+            rows = [
+                {"month": f"2098-{m + 1:02d}", "category_id": self.categories[user][0], "limit": i + 1}
+                for m in range(12)
+            ]
+            return self.call(user, "POST", "/budgets/bulk", json=rows)
+
+        def update_budget(user, i):
+            budget_id, month = self.budgets[user][i % len(self.budgets[user])]
+            body = {"month": month, "category_id": self.categories[user][0], "limit": i + 1}
+            return self.call(user, "PUT", f"/budgets/{budget_id}/update", json=body)
+
+        def delete_budget(user, i):
+            return self.call(user, "DELETE", f"/budgets/{self.budgets[user].pop()[0]}/delete")
+
+        return {
+            "POST /categories/create": create_category,
+            "GET /categories": lambda user, i: self.call(user, "GET", "/categories"),
+            "GET /categories?limit=50": lambda user, i: self.call(user, "GET", "/categories", params={"limit": 50}),
+            "GET /categories (ndjson)": lambda user, i: self.call(user, "GET", "/categories", **ndjson),
+            "GET /categories?include_items=true": lambda user, i: self.call(
+                user, "GET", "/categories", params={"include_items": "true"}
+            ),
+            "GET /categories/{id}/items": category_items,
+            "PUT /categories/{id}/update": update_category,
+            "POST /expenses/invalidate": lambda user, i: self.call(user, "POST", "/expenses/invalidate"),
+            "POST /budgets/upsert": upsert_budget,
+            "POST /budgets/bulk": bulk_budgets,
+            "GET /budgets": lambda user, i: self.call(user, "GET", "/budgets"),
+            "GET /budgets?limit=50": lambda user, i: self.call(user, "GET", "/budgets", params={"limit": 50}),
+            "GET /budgets (ndjson)": lambda user, i: self.call(user, "GET", "/budgets", **ndjson),
+            "PUT /budgets/{id}/update": update_budget,
+            "DELETE /budgets/{id}/delete": delete_budget,
+            "DELETE /categories/{id}/delete": delete_category,
+        }
+
+    async def run(self, name: str, fn) -> dict:
+        latencies: list[float] = []
+        errors: dict[str, int] = {}
+        issued = iter(range(self.requests))
+
+        async def worker():
+            for i in issued:
+                user = self.users[i % len(self.users)]
+                start = time.perf_counter()
+                try:
+                    await fn(user, i)
+                except Exception as exc:
+                    response = getattr(exc, "response", None)
+                    kind = f"HTTP {response.status_code}" if response is not None else type(exc).__name__
+                    errors[kind] = errors.get(kind, 0) + 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            "requests": self.requests,
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            "p50_ms": round(_percentile(latencies, 50), 2),
+            "p95_ms": round(_percentile(latencies, 95), 2),
+            "p99_ms": round(_percentile(latencies, 99), 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        }
+
+
+async def drive(args) -> dict:
+    import httpx
+
+    users = [f"load-user-{n}" for n in range(args.users)]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.app_port}", limits=limits, timeout=60) as client:
+        await _wait_ready(client, "/readyz")
+        await _wait_ready(client, f"http://127.0.0.1:{args.expense_port}/docs")
+        driver = Driver(client, users, args.jwt_secret, args.concurrency, args.requests)
+        await driver.seed(args.categories)
+        selected = [name for name in driver.scenarios() if not args.route or any(r in name for r in args.route)]
+        routes = {}
+        for name in selected:
+            routes[name] = await driver.run(name, driver.scenarios()[name])
+    return {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "mongo": "memory" if args.uri == MEMORY_URI else "mongodb",
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "requests_per_route": args.requests,
+        "expenses_per_user": args.expenses,
+        "items_per_expense": args.items,
+        "routes": routes,
+    }
+
+
+def run(args) -> dict:
+    """
+    Starts the fake soa-expense and the app, drives the routes and returns
+    the report; the child processes are stopped afterwards.
+    """
+    if args.workers > 1 and args.uri == MEMORY_URI:
+        raise SystemExit("--workers > 1 needs a real MongoDB (--uri); workers cannot share the in-memory stand-in")
+    args.app_port = args.app_port or _free_port()
+    args.expense_port = args.expense_port or _free_port()
+    if args.uri != MEMORY_URI:
+        # Start from an empty database so runs are comparable.
+        from pymongo import MongoClient
+
+        with MongoClient(args.uri) as sync_client:
+            sync_client.drop_database(args.db)
+
+    children = [_spawn(args, "expenses"), _spawn(args, "app")]
+    try:
+        report = asyncio.run(drive(args))
+    finally:
+        for child in children:
+            child.terminate()
+        for child in children:
+            child.wait(timeout=10)
+    report["workers"] = args.workers
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", MEMORY_URI),
+                        help=f"MongoDB URI, or '{MEMORY_URI}' for the mongomock-motor stand-in")
+    parser.add_argument("--db", default="category_budget_load")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--categories", type=int, default=20, help="seeded categories per user")
+    parser.add_argument("--expenses", type=int, default=100, help="expenses per user served by the fake soa-expense")
+    parser.add_argument("--items", type=int, default=3, help="items per expense")
+    parser.add_argument("--descriptions", type=int, default=10, help="distinct expense descriptions")
+    parser.add_argument("--route", action="append", help="only run routes containing this text (repeatable)")
+    parser.add_argument("--jwt-secret", default=os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production"))
+    parser.add_argument("--app-port", type=int, default=0)
+    parser.add_argument("--expense-port", type=int, default=0)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show app and fake server output")
+    parser.add_argument("--workers", type=int, default=1, help="app worker processes (server.py --workers)")
+    parser.add_argument("--serve", choices=("app", "expenses"), help=argparse.SUPPRESS)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.serve == "app":
+        return serve_app(args)
+    if args.serve == "expenses":
+        return serve_expenses(args)
+
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
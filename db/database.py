@@ -1,19 +1,158 @@
 import os
+from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
 import certifi
 
+from db.monitoring import CommandMetricsListener, PoolMetricsListener
+
 load_dotenv()
 
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGODB_DB = os.getenv("MONGODB_DB")
 
-if not MONGODB_URI:
-    raise RuntimeError("MONGODB_URI ni najden/ga ni brat")
+_READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name, "").strip()
+    return int(value) if value else None
+
+
+@dataclass(frozen=True)
+class MongoSettings:
+    """
+    Client options on top of MONGODB_URI. `None` leaves the driver default
+    (or whatever the URI sets) in place.
+    """
+
+    max_pool_size: int = 100
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = None
+    wait_queue_timeout_ms: Optional[int] = None
+    server_selection_timeout_ms: Optional[int] = None
+    compressors: tuple[str, ...] = ()
+    zlib_compression_level: Optional[int] = None
+    # Read preference of the read-only handles (listings); writes always go to the primary.
+    read_preference: str = "primary"
+    max_staleness_s: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        return cls(
+            max_pool_size=int(os.getenv("MONGODB_MAX_POOL_SIZE", "100")),
+            min_pool_size=int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+            max_idle_time_ms=_optional_int("MONGODB_MAX_IDLE_TIME_MS"),
+            wait_queue_timeout_ms=_optional_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS"),
+            server_selection_timeout_ms=_optional_int("MONGODB_SERVER_SELECTION_TIMEOUT_MS"),
+            compressors=tuple(c.strip() for c in os.getenv("MONGODB_COMPRESSORS", "").split(",") if c.strip()),
+            zlib_compression_level=_optional_int("MONGODB_ZLIB_COMPRESSION_LEVEL"),
+            read_preference=os.getenv("MONGODB_READ_PREFERENCE", "primary"),
+            max_staleness_s=_optional_int("MONGODB_MAX_STALENESS_S"),
+        )
+
+    def client_options(self) -> dict:
+        options = {"maxPoolSize": self.max_pool_size, "minPoolSize": self.min_pool_size}
+        optional = {
+            "maxIdleTimeMS": self.max_idle_time_ms,
+            "waitQueueTimeoutMS": self.wait_queue_timeout_ms,
+            "serverSelectionTimeoutMS": self.server_selection_timeout_ms,
+            "zlibCompressionLevel": self.zlib_compression_level,
+        }
+        options.update({key: value for key, value in optional.items() if value is not None})
+        if self.compressors:
+            # zstd needs the `zstandard` package and snappy `python-snappy`; the driver
+            # warns and skips a compressor whose package is missing.
+            options["compressors"] = ",".join(self.compressors)
+        return options
+
+    def read_mode(self):
+        mode = _READ_PREFERENCES.get(self.read_preference)
+        if mode is None:
+            raise ValueError(f"Unknown MONGODB_READ_PREFERENCE {self.read_preference!r}")
+        if mode is Primary:
+            return Primary()
+        return mode(max_staleness=self.max_staleness_s if self.max_staleness_s is not None else -1)
+
+
+# One client per process: a client inherited across fork shares the parent's
+# sockets and must not be used, so a pid change builds a fresh one.
+_client: Optional[AsyncMongoClient] = None
+_client_pid: Optional[int] = None
+_pool_listener: Optional[PoolMetricsListener] = None
+_settings: Optional[MongoSettings] = None
 
-client = MongoClient(MONGODB_URI, tlsCAFile=certifi.where())
-db = client[MONGODB_DB]
+
+def get_settings() -> MongoSettings:
+    global _settings
+    if _settings is None:
+        _settings = MongoSettings.from_env()
+    return _settings
+
+
+def get_client() -> AsyncMongoClient:
+    global _client, _client_pid, _pool_listener
+    if _client is None or _client_pid != os.getpid():
+        if not MONGODB_URI:
+            raise RuntimeError("MONGODB_URI ni najden/ga ni brat")
+        _pool_listener = PoolMetricsListener()
+        # AsyncMongoClient does not block the event loop; sockets are opened on first use.
+        _client = AsyncMongoClient(
+            MONGODB_URI,
+            tlsCAFile=certifi.where(),
+            event_listeners=[CommandMetricsListener(), _pool_listener],
+            **get_settings().client_options(),
+        )
+        _client_pid = os.getpid()
+    return _client
+
+
+def set_client(client) -> None:
+    """
+    Installs a pre-built client for this process (e.g. an in-memory stand-in).
+    """
+    global _client, _client_pid, _pool_listener
+    _client, _client_pid, _pool_listener = client, os.getpid(), None
+
+
+async def close_client() -> None:
+    global _client, _client_pid, _pool_listener
+    if _client is not None and _client_pid == os.getpid():
+        await _client.close()
+    _client, _client_pid, _pool_listener = None, None, None
 
 
 def get_db():
-    return db
+    return get_client()[MONGODB_DB]
+
+
+def get_read_db():
+    """
+    Database handle for read-only paths that tolerate replication lag
+    (listings); uses MONGODB_READ_PREFERENCE. Writes and reads that must see
+    the latest write (duplicate and ownership checks) use get_db().
+    """
+    return get_client().get_database(MONGODB_DB, read_preference=get_settings().read_mode())
+
+
+def pool_stats() -> dict:
+    """
+    Connection pool counters of this process's client (empty before first use).
+    """
+    if _pool_listener is None or _client_pid != os.getpid():
+        return {}
+    return _pool_listener.stats()
@@ -0,0 +1,188 @@
+"""
+Versioned index migrations for category_data, category_items and budget_data.
+
+Applied migrations are recorded in the `schema_migrations` collection, so each
+step runs once per database. Run at startup (see server.py) or manually:
+
+    python -m db.indexes            # apply pending migrations
+    python -m db.indexes --check    # apply, then fail if a service query uses COLLSCAN
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import ASCENDING, IndexModel
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+MIGRATIONS_ID = "indexes"
+
+logger = logging.getLogger("soa-category-budget")
+
+
+async def _v1_initial_indexes(db):
+    await db["category_data"].create_indexes([
+        IndexModel(
+            [("user_id", ASCENDING), ("name", ASCENDING)],
+            name="user_id_name_unique",
+            unique=True,
+        ),
+    ])
+    await db["budget_data"].create_indexes([
+        IndexModel(
+            [("user_id", ASCENDING), ("month", ASCENDING), ("category_id", ASCENDING)],
+            name="user_id_month_category_id_unique",
+            unique=True,
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("month", ASCENDING)],
+            name="user_id_month",
+        ),
+    ])
+
+
+async def _v2_budget_keyset_index(db):
+    # Serves keyset pagination on (month, _id); (user_id, month) is a prefix of it.
+    await db["budget_data"].create_indexes([
+        IndexModel(
+            [("user_id", ASCENDING), ("month", ASCENDING), ("_id", ASCENDING)],
+            name="user_id_month_id",
+        ),
+    ])
+    if "user_id_month" in await db["budget_data"].index_information():
+        await db["budget_data"].drop_index("user_id_month")
+
+
+async def _v3_category_expense_index(db):
+    # Lets expense events $pull an expense's items without scanning the user's categories.
+    await db["category_data"].create_indexes([
+        IndexModel(
+            [("user_id", ASCENDING), ("items.expense_id", ASCENDING)],
+            name="user_id_items_expense_id",
+        ),
+    ])
+
+
+async def _v4_category_items_indexes(db):
+    # Item buckets are read in seq order per category and pulled by expense id.
+    await db["category_items"].create_indexes([
+        IndexModel(
+            [("user_id", ASCENDING), ("category_id", ASCENDING), ("seq", ASCENDING)],
+            name="user_id_category_id_seq_unique",
+            unique=True,
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("items.expense_id", ASCENDING)],
+            name="user_id_items_expense_id",
+        ),
+    ])
+
+
+# (version, description, coroutine). Append new steps; never reorder or edit applied ones.
+MIGRATIONS = [
+    (1, "unique (user_id, name) on categories; (user_id, month[, category_id]) on budgets", _v1_initial_indexes),
+    (2, "(user_id, month, _id) on budgets for keyset pagination", _v2_budget_keyset_index),
+    (3, "(user_id, items.expense_id) on categories for expense events", _v3_category_expense_index),
+    (4, "(user_id, category_id, seq) and (user_id, items.expense_id) on category item buckets", _v4_category_items_indexes),
+]
+
+# Queries issued by the services, as (collection, filter, sort). Values are placeholders;
+# only the shape matters for the query planner.
+SERVICE_QUERIES = [
+    ("category_data", {"user_id": "u"}, {"name": 1}),
+    ("category_data", {"user_id": "u", "name": {"$gt": "n"}}, {"name": 1}),
+    ("category_data", {"user_id": "u", "name": "n"}, None),
+    ("category_data", {"user_id": "u", "name": {"$in": ["a", "b"]}}, None),
+    ("category_data", {"user_id": "u", "items.expense_id": "e"}, None),
+    ("category_items", {"user_id": "u", "category_id": "c", "seq": {"$gte": 0}}, {"seq": 1}),
+    ("category_items", {"user_id": "u", "category_id": {"$in": ["a", "b"]}}, {"category_id": 1, "seq": 1}),
+    ("category_items", {"user_id": "u", "category_id": "c"}, {"seq": -1}),
+    ("category_items", {"user_id": "u", "items.expense_id": "e"}, None),
+    ("budget_data", {"user_id": "u"}, {"month": 1, "_id": 1}),
+    ("budget_data", {"user_id": "u", "month": "2024-01"}, {"month": 1, "_id": 1}),
+    (
+        "budget_data",
+        {"user_id": "u", "$or": [{"month": {"$gt": "2024-01"}}, {"month": "2024-01", "_id": {"$gt": "x"}}]},
+        {"month": 1, "_id": 1},
+    ),
+    ("budget_data", {"user_id": "u", "month": "2024-01", "category_id": "c"}, None),
+    ("budget_data", {"user_id": "u", "month": {"$in": ["2024-01"]}, "category_id": {"$in": ["c"]}}, None),
+]
+
+
+async def get_schema_version(db) -> int:
+    doc = await db[MIGRATIONS_COLLECTION].find_one({"_id": MIGRATIONS_ID})
+    return doc["version"] if doc else 0
+
+
+async def apply_migrations(db) -> int:
+    """
+    Runs every migration newer than the recorded version and returns the
+    resulting version. Index creation is idempotent, so concurrent runs from
+    several instances are safe.
+    """
+    version = await get_schema_version(db)
+    for step, description, migrate in MIGRATIONS:
+        if step <= version:
+            continue
+        logger.info("Applying index migration %s: %s", step, description)
+        await migrate(db)
+        await db[MIGRATIONS_COLLECTION].update_one(
+            {"_id": MIGRATIONS_ID},
+            {"$max": {"version": step}, "$set": {"updated_at": datetime.now()}},
+            upsert=True,
+        )
+        version = step
+    return version
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+async def check_query_plans(db) -> list[str]:
+    """
+    Explains every query in SERVICE_QUERIES and returns a description of each
+    one whose winning plan contains a COLLSCAN.
+    """
+    offenders = []
+    for collection, query, sort in SERVICE_QUERIES:
+        find = {"find": collection, "filter": query}
+        if sort:
+            find["sort"] = sort
+        explain = await db.command("explain", find, verbosity="queryPlanner")
+        winning = explain["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_plan_stages(winning)):
+            offenders.append(f"{collection} filter={query} sort={sort}")
+    return offenders
+
+
+async def _main(check: bool) -> int:
+    from db.database import close_client, get_db
+
+    db = get_db()
+    try:
+        version = await apply_migrations(db)
+        print(f"Index schema version: {version}")
+        if check:
+            offenders = await check_query_plans(db)
+            for offender in offenders:
+                print(f"COLLSCAN: {offender}")
+            if offenders:
+                return 1
+            print("All service queries use an index")
+        return 0
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply index migrations")
+    parser.add_argument("--check", action="store_true", help="fail if any service query plans a COLLSCAN")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_main(args.check)))
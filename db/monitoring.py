@@ -0,0 +1,165 @@
+import logging
+import os
+
+from pymongo import monitoring
+
+from logging_utils import correlation_id_var, query_stats_var
+from metrics import MONGO_LATENCY, MONGO_POOL_WAIT
+
+# Where each command keeps its filter, for the slow-query log.
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+_STATEMENT_FIELDS = {"update": "updates", "delete": "deletes"}
+
+
+def _slow_query_ms() -> float:
+    return float(os.getenv("MONGODB_SLOW_QUERY_MS", "100"))
+
+
+def filter_shape(value):
+    """
+    Replaces the values of a filter with `?`, keeping field names and
+    operators, so slow queries can be grouped without leaking user data.
+    """
+    if isinstance(value, dict):
+        return {key: filter_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = filter_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+
+def command_filter(command_name: str, command: dict):
+    if command_name in _FILTER_FIELDS:
+        return command.get(_FILTER_FIELDS[command_name])
+    if command_name in _STATEMENT_FIELDS:
+        statements = command.get(_STATEMENT_FIELDS[command_name]) or [{}]
+        return statements[0].get("q")
+    if command_name == "aggregate":
+        for stage in command.get("pipeline") or []:
+            if "$match" in stage:
+                return stage["$match"]
+    return None
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Records the latency of every Mongo command per collection and command
+    name, adds it to the current request's query totals and logs commands
+    slower than `MONGODB_SLOW_QUERY_MS` with their filter shape. Callbacks
+    run inline with the driver, so the fast path only does dict work.
+    """
+
+    def __init__(self, slow_query_ms: float | None = None):
+        self.slow_query_ms = _slow_query_ms() if slow_query_ms is None else slow_query_ms
+        self.logger = logging.getLogger("soa-category-budget")
+        self._started: dict[tuple, tuple] = {}
+
+    @staticmethod
+    def _key(event) -> tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        # getMore carries the cursor id under its command name
+        field = "collection" if event.command_name == "getMore" else event.command_name
+        collection = event.command.get(field)
+        self._started[self._key(event)] = (
+            collection if isinstance(collection, str) else "-",
+            correlation_id_var.get(),
+            event.command,
+        )
+
+    def _finish(self, event, outcome: str):
+        collection, correlation_id, command = self._started.pop(self._key(event), ("-", None, {}))
+        duration_ms = event.duration_micros / 1000
+        MONGO_LATENCY.labels(collection, event.command_name, outcome).observe(duration_ms / 1000)
+
+        query_stats = query_stats_var.get()
+        if query_stats is not None:
+            query_stats["count"] += 1
+            query_stats["ms"] += duration_ms
+
+        if self.slow_query_ms and duration_ms >= self.slow_query_ms:
+            self.logger.warning(
+                "Slow Mongo command %s on %s took %.2f ms (%s) filter=%s",
+                event.command_name, collection, duration_ms, outcome,
+                filter_shape(command_filter(event.command_name, command)),
+                extra={"correlation_id": correlation_id},
+            )
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks connection pool usage: open and checked-out connections, checkout
+    counts and the time spent waiting for a connection. A growing wait time
+    with `checked_out` at MONGODB_MAX_POOL_SIZE means the pool is too small.
+    """
+
+    def __init__(self):
+        self._stats = {
+            "connections": 0,
+            "checked_out": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "checkout_wait_ms": 0.0,
+            "pool_clears": 0,
+        }
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+    def _checkout_wait(self, event, outcome: str):
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            self._stats["checkout_wait_ms"] += duration * 1000
+            MONGO_POOL_WAIT.labels(outcome).observe(duration)
+
+    def connection_checked_out(self, event):
+        self._stats["checked_out"] += 1
+        self._stats["checkouts"] += 1
+        self._checkout_wait(event, "success")
+
+    def connection_check_out_failed(self, event):
+        self._stats["checkout_failures"] += 1
+        self._checkout_wait(event, str(event.reason))
+
+    def connection_checked_in(self, event):
+        self._stats["checked_out"] -= 1
+
+    def connection_created(self, event):
+        self._stats["connections"] += 1
+
+    def connection_closed(self, event):
+        self._stats["connections"] -= 1
+
+    def pool_cleared(self, event):
+        self._stats["pool_clears"] += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
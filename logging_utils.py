@@ -2,6 +2,9 @@ import contextvars
 import json
 import logging
 import os
+import queue
+import threading
+import tempfile
 import time
 from datetime import datetime, timezone
 from typing import Optional
@@ -9,12 +12,19 @@ from uuid import uuid4
 
 import pika
 
+from metrics import REQUEST_LATENCY
+
 correlation_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
     "correlation_id", default=None
 )
+# Per-request Mongo command totals, filled in by db.monitoring.CommandMetricsListener.
+query_stats_var: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "query_stats", default=None
+)
 
 _logger: Optional[logging.Logger] = None
 _service_name: Optional[str] = None
+_rabbit_handler: Optional["RabbitMQHandler"] = None
 
 
 def get_correlation_id() -> Optional[str]:
@@ -30,13 +40,187 @@ def _rabbit_config():
         "exchange": os.getenv("RABBITMQ_EXCHANGE", "logs-exchange"),
         "queue": os.getenv("RABBITMQ_QUEUE", "logs-queue"),
         "routing_key": os.getenv("RABBITMQ_ROUTING_KEY", "logs.route"),
+        "buffer_size": int(os.getenv("RABBITMQ_LOG_BUFFER_SIZE", "10000")),
+        "batch_size": int(os.getenv("RABBITMQ_LOG_BATCH_SIZE", "100")),
+        "flush_interval": float(os.getenv("RABBITMQ_LOG_FLUSH_INTERVAL_S", "0.5")),
+        "drop_policy": os.getenv("RABBITMQ_LOG_DROP_POLICY", "drop_new"),
+        "block_timeout": float(os.getenv("RABBITMQ_LOG_BLOCK_TIMEOUT_S", "0.05")),
+        "spool_dir": os.getenv(
+            "RABBITMQ_LOG_SPOOL_DIR",
+            os.path.join(tempfile.gettempdir(), "soa-category-budget-log-spool"),
+        ),
+        "spool_segment_bytes": int(os.getenv("RABBITMQ_LOG_SPOOL_SEGMENT_BYTES", str(1024 * 1024))),
+        "spool_max_bytes": int(os.getenv("RABBITMQ_LOG_SPOOL_MAX_BYTES", str(64 * 1024 * 1024))),
     }
 
 
+DROP_POLICIES = ("drop_new", "drop_oldest", "block")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LogSpool:
+    """
+    Append-only on-disk spool of log payloads (one JSON document per line),
+    split into segments of about `segment_bytes`. When the total exceeds
+    `max_bytes` the oldest segment is dropped. Records are read back in order
+    with `peek` and removed with `ack`; fully read segments are deleted.
+
+    Segment names carry the writer's pid. On start, segments left behind by a
+    process that is no longer running are claimed (renamed) and replayed.
+    Only the publisher thread touches a spool, so it is not locked.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, max_bytes: int):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.prefix = f"spool-{os.getpid()}-"
+        self.segments: list[str] = []
+        self.sizes: dict[str, int] = {}
+        self.read_offset = 0
+        self.spooled = 0
+        self.dropped = 0
+        self._writer = None
+        self._seq = 0
+        self._peeked: list[int] = []
+        self._adopt_orphans()
+
+    def _adopt_orphans(self):
+        found = []
+        for name in os.listdir(self.directory):
+            parts = name[:-len(".log")].split("-") if name.endswith(".log") else []
+            if len(parts) != 4 or parts[0] != "spool" or not all(p.isdigit() for p in parts[1:]):
+                continue
+            pid = int(parts[1])
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            target = os.path.join(self.directory, f"{self.prefix}{parts[2]}-{parts[3]}.log")
+            try:
+                os.rename(os.path.join(self.directory, name), target)
+            except OSError:
+                continue  # claimed by another process first
+            found.append(((int(parts[2]), int(parts[3])), target))
+        for _, path in sorted(found):
+            self.segments.append(path)
+            self.sizes[path] = os.path.getsize(path)
+
+    @property
+    def bytes(self) -> int:
+        return sum(self.sizes.values()) - self.read_offset
+
+    def has_data(self) -> bool:
+        return self.bytes > 0
+
+    def _open_segment(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._seq += 1
+        path = os.path.join(self.directory, f"{self.prefix}{time.time_ns()}-{self._seq}.log")
+        self._writer = open(path, "ab")
+        self.segments.append(path)
+        self.sizes[path] = 0
+
+    def append(self, records: list[bytes]):
+        if self._writer is None or self.sizes[self.segments[-1]] >= self.segment_bytes:
+            self._open_segment()
+        data = b"".join(record + b"\n" for record in records)
+        self._writer.write(data)
+        self._writer.flush()
+        self.sizes[self.segments[-1]] += len(data)
+        self.spooled += len(records)
+        while self.bytes > self.max_bytes and len(self.segments) > 1:
+            self._drop_head()
+
+    def _drop_head(self):
+        head = self.segments[0]
+        with open(head, "rb") as f:
+            f.seek(self.read_offset)
+            self.dropped += sum(1 for _ in f)
+        self._remove_head()
+
+    def _remove_head(self):
+        head = self.segments.pop(0)
+        del self.sizes[head]
+        self.read_offset = 0
+        self._peeked = []
+        if not self.segments and self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        try:
+            os.remove(head)
+        except OSError:
+            pass
+
+    def peek(self, limit: int) -> list[bytes]:
+        """
+        Returns up to `limit` of the oldest records without removing them.
+        """
+        while self.segments:
+            lines: list[bytes] = []
+            with open(self.segments[0], "rb") as f:
+                f.seek(self.read_offset)
+                while len(lines) < limit:
+                    line = f.readline()
+                    if not line:
+                        break
+                    lines.append(line)
+            if lines:
+                self._peeked = [len(line) for line in lines]
+                return [line.rstrip(b"\n") for line in lines]
+            if len(self.segments) == 1:
+                break
+            self._remove_head()
+        self._peeked = []
+        return []
+
+    def ack(self, count: int):
+        """
+        Removes the first `count` records returned by the last `peek`.
+        """
+        if not count:
+            return
+        self.read_offset += sum(self._peeked[:count])
+        self._peeked = self._peeked[count:]
+        if self.read_offset >= self.sizes[self.segments[0]]:
+            self._remove_head()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
 class RabbitMQHandler(logging.Handler):
+    """
+    Queue-backed log shipper. `emit` only serializes the record and puts it in
+    a bounded in-memory buffer; a background thread owns the broker connection
+    and publishes in batches of `batch_size` or every `flush_interval` seconds.
+
+    When the buffer is full the drop policy decides: `drop_new` discards the
+    incoming record, `drop_oldest` discards the oldest buffered one, `block`
+    waits up to `block_timeout` seconds for room and then discards the record.
+
+    While the broker is unreachable, batches go to a LogSpool on disk instead
+    of waiting in memory; once publishing works again the spool is replayed
+    in order before newer records. Setting RABBITMQ_LOG_SPOOL_DIR to an empty
+    string disables the spool.
+    """
+
     def __init__(self, service_name: str):
         super().__init__()
         cfg = _rabbit_config()
+        if cfg["drop_policy"] not in DROP_POLICIES:
+            raise ValueError(f"RABBITMQ_LOG_DROP_POLICY must be one of {', '.join(DROP_POLICIES)}")
         credentials = pika.PlainCredentials(cfg["user"], cfg["password"])
         self.connection_params = pika.ConnectionParameters(
             host=cfg["host"],
@@ -48,9 +232,36 @@ class RabbitMQHandler(logging.Handler):
         self.queue = cfg["queue"]
         self.routing_key = cfg["routing_key"]
         self.service_name = service_name
+        self.batch_size = cfg["batch_size"]
+        self.flush_interval = cfg["flush_interval"]
+        self.drop_policy = cfg["drop_policy"]
+        self.block_timeout = cfg["block_timeout"]
+        self.spool_config = (cfg["spool_dir"], cfg["spool_segment_bytes"], cfg["spool_max_bytes"])
+        self.buffer_size = cfg["buffer_size"]
+        self._start()
+
+    def _start(self):
+        """
+        Creates the per-process state: buffer, spool and publisher thread.
+        Called again in a forked child, which inherits none of the parent's
+        threads and must not reuse its broker connection.
+        """
+        self._pid = os.getpid()
         self.connection = None
         self.channel = None
-        self._connect()
+        self.spool = None
+        if self.spool_config[0]:
+            self.spool = LogSpool(*self.spool_config)
+        self.buffer: queue.Queue[bytes] = queue.Queue(maxsize=self.buffer_size)
+        self.queued = 0
+        self.dropped = 0
+        self.published = 0
+        self.publish_errors = 0
+        self._stop = threading.Event()
+        self._publisher = threading.Thread(
+            target=self._publish_loop, name="rabbitmq-log-publisher", daemon=True
+        )
+        self._publisher.start()
 
     def _connect(self):
         if self.connection and getattr(self.connection, "is_open", False):
@@ -65,42 +276,194 @@ class RabbitMQHandler(logging.Handler):
             queue=self.queue, exchange=self.exchange, routing_key=self.routing_key
         )
 
+    def _payload(self, record: logging.LogRecord) -> bytes:
+        correlation_id = getattr(record, "correlation_id", None) or get_correlation_id()
+        url = getattr(record, "url", "") or getattr(record, "path", "")
+        timestamp = datetime.now(timezone.utc).isoformat()
+        payload = {
+            "timestamp": timestamp,
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "service": self.service_name,
+            "correlation_id": correlation_id,
+            "url": url,
+            "method": getattr(record, "method", ""),
+            "status_code": getattr(record, "status_code", None),
+        }
+        payload["formatted"] = (
+            f"{timestamp} {record.levelname} {url} "
+            f"Correlation:{correlation_id or '-'} [{self.service_name}] - {payload['message']}"
+        )
+        return json.dumps(payload).encode("utf-8")
+
     def emit(self, record: logging.LogRecord):
+        if self._pid != os.getpid():
+            # Forked worker: the parent's publisher thread did not survive the fork.
+            self._start()
         try:
-            self._connect()
-            correlation_id = getattr(record, "correlation_id", None) or get_correlation_id()
-            url = getattr(record, "url", "") or getattr(record, "path", "")
-            timestamp = datetime.now(timezone.utc).isoformat()
-            payload = {
-                "timestamp": timestamp,
-                "level": record.levelname,
-                "message": record.getMessage(),
-                "service": self.service_name,
-                "correlation_id": correlation_id,
-                "url": url,
-                "method": getattr(record, "method", ""),
-                "status_code": getattr(record, "status_code", None),
-            }
-            payload["formatted"] = (
-                f"{timestamp} {record.levelname} {url} "
-                f"Correlation:{correlation_id or '-'} [{self.service_name}] - {payload['message']}"
-            )
-            body = json.dumps(payload).encode("utf-8")
-            self.channel.basic_publish(
-                exchange=self.exchange,
-                routing_key=self.routing_key,
-                body=body,
-                properties=pika.BasicProperties(
-                    content_type="application/json", delivery_mode=2
-                ),
-            )
+            body = self._payload(record)
         except Exception:
             self.handleError(record)
+            return
+        try:
+            if self.drop_policy == "block":
+                self.buffer.put(body, timeout=self.block_timeout)
+            else:
+                self.buffer.put_nowait(body)
+        except queue.Full:
+            if self.drop_policy != "drop_oldest":
+                self.dropped += 1
+                return
+            try:
+                self.buffer.get_nowait()
+                self.dropped += 1
+                self.buffer.put_nowait(body)
+            except (queue.Empty, queue.Full):
+                self.dropped += 1
+                return
+        self.queued += 1
+
+    def _take_batch(self) -> list[bytes]:
+        batch: list[bytes] = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self.buffer.get(timeout=timeout))
+            except queue.Empty:
+                break
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch
+
+    def _publish(self, batch: list[bytes]) -> list[bytes]:
+        """
+        Publishes `batch` in order and returns whatever could not be sent.
+        """
+        sent = 0
+        try:
+            self._connect()
+            properties = pika.BasicProperties(content_type="application/json", delivery_mode=2)
+            for body in batch:
+                self.channel.basic_publish(
+                    exchange=self.exchange,
+                    routing_key=self.routing_key,
+                    body=body,
+                    properties=properties,
+                )
+                sent += 1
+        except Exception:
+            self.publish_errors += 1
+            self._close_connection()
+        self.published += sent
+        return batch[sent:]
+
+    def _spool_buffered(self):
+        records: list[bytes] = []
+        while True:
+            try:
+                records.append(self.buffer.get_nowait())
+            except queue.Empty:
+                break
+        if records:
+            self.spool.append(records)
+
+    def _drain_spool(self) -> bool:
+        """
+        Publishes one batch from the spool; newer buffered records are spooled
+        first so ordering is preserved. Returns False if publishing failed.
+        """
+        self._spool_buffered()
+        records = self.spool.peek(self.batch_size)
+        unsent = self._publish(records)
+        self.spool.ack(len(records) - len(unsent))
+        return not unsent
+
+    def _wait(self, seconds: float):
+        # Keep moving new records to disk while waiting, so the memory buffer does not fill up.
+        deadline = time.monotonic() + seconds
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._stop.wait(min(remaining, self.flush_interval))
+            if self.spool is not None:
+                self._spool_buffered()
+
+    def _publish_loop(self):
+        pending: list[bytes] = []
+        backoff = 0.0
+        while True:
+            if self.spool is not None and self.spool.has_data():
+                ok = self._drain_spool()
+            else:
+                if not pending:
+                    if self._stop.is_set() and self.buffer.empty():
+                        break
+                    pending = self._take_batch()
+                    if not pending:
+                        continue
+                pending = self._publish(pending)
+                if pending and self.spool is not None:
+                    self.spool.append(pending)
+                    pending = []
+                    ok = False
+                else:
+                    ok = not pending
+
+            if ok:
+                backoff = 0.0
+                continue
+            if self._stop.is_set():
+                break
+            backoff = min(max(backoff * 2, 0.5), 30.0)
+            self._wait(backoff)
+
+        if self.spool is not None:
+            self._spool_buffered()
+            self.spool.close()
+
+    def _close_connection(self):
+        try:
+            if self.connection and getattr(self.connection, "is_open", False):
+                self.connection.close()
+        except Exception:
+            pass
+        self.connection = None
+        self.channel = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "published": self.published,
+            "publish_errors": self.publish_errors,
+            "buffer_depth": self.buffer.qsize(),
+            "spooled": self.spool.spooled if self.spool else 0,
+            "spool_dropped": self.spool.dropped if self.spool else 0,
+            "spool_bytes": self.spool.bytes if self.spool else 0,
+        }
 
+    def close(self):
+        if self._pid == os.getpid():
+            self._stop.set()
+            self._publisher.join(timeout=5)
+            self._close_connection()
+        super().close()
 
-def setup_logging(service_name: str) -> logging.Logger:
+
+def setup_logging(service_name: str, ship: bool = True) -> logging.Logger:
+    """
+    Configures the service logger with a stream handler. With `ship` the
+    RabbitMQ handler is attached right away; otherwise call
+    `start_log_shipping` later (server.py does it in the lifespan).
+    """
     global _logger, _service_name
     if _logger:
+        if ship:
+            start_log_shipping()
         return _logger
 
     _service_name = service_name
@@ -124,15 +487,43 @@ def setup_logging(service_name: str) -> logging.Logger:
     stream_handler.setFormatter(formatter)
     logger.addHandler(stream_handler)
 
+    _logger = logger
+    if ship:
+        start_log_shipping()
+    return logger
+
+
+def start_log_shipping() -> Optional["RabbitMQHandler"]:
+    """
+    Attaches the RabbitMQ handler to the service logger (once).
+    """
+    global _rabbit_handler
+    if _rabbit_handler is not None or _logger is None:
+        return _rabbit_handler
     try:
-        rabbit_handler = RabbitMQHandler(service_name)
-        rabbit_handler.setFormatter(formatter)
-        logger.addHandler(rabbit_handler)
+        rabbit_handler = RabbitMQHandler(_service_name)
+        rabbit_handler.setFormatter(_logger.handlers[0].formatter)
+        _logger.addHandler(rabbit_handler)
+        _rabbit_handler = rabbit_handler
     except Exception as e:
-        logger.error("Failed to initialize RabbitMQ logger: %s", e)
+        _logger.error("Failed to initialize RabbitMQ logger: %s", e)
+    return _rabbit_handler
 
-    _logger = logger
-    return logger
+
+def stop_log_shipping():
+    """
+    Detaches the RabbitMQ handler after flushing what it can.
+    """
+    global _rabbit_handler
+    if _rabbit_handler is None:
+        return
+    _logger.removeHandler(_rabbit_handler)
+    _rabbit_handler.close()
+    _rabbit_handler = None
+
+
+def get_rabbit_handler() -> Optional[RabbitMQHandler]:
+    return _rabbit_handler
 
 
 def get_logger() -> logging.Logger:
@@ -143,23 +534,34 @@ def get_logger() -> logging.Logger:
     return logging.getLogger()
 
 
+def _observe_request(request, status_code: int, elapsed: float):
+    # Label by route template, never the raw path, to keep cardinality bounded.
+    route = request.scope.get("route")
+    template = getattr(route, "path", None) or "unmatched"
+    REQUEST_LATENCY.labels(template, request.method, str(status_code)).observe(elapsed)
+
+
 def init_request_logging(app, service_name: str):
     """
-    Registers middleware for correlation IDs and request logging.
+    Registers middleware for correlation IDs and request logging. Log
+    shipping to RabbitMQ is started separately by `start_log_shipping`.
     """
-    logger = setup_logging(service_name)
+    logger = setup_logging(service_name, ship=False)
 
     @app.middleware("http")
     async def correlation_and_logging_middleware(request, call_next):
         correlation_id = request.headers.get("X-Correlation-Id") or str(uuid4())
         correlation_id_var.set(correlation_id)
         request.state.correlation_id = correlation_id
+        query_stats = {"count": 0, "ms": 0.0}
+        query_stats_var.set(query_stats)
 
         start = time.perf_counter()
         try:
             response = await call_next(request)
         except Exception:
             elapsed = time.perf_counter() - start
+            _observe_request(request, 500, elapsed)
             logger.exception(
                 "Request failed",
                 extra={
@@ -174,9 +576,11 @@ def init_request_logging(app, service_name: str):
             raise
 
         elapsed = time.perf_counter() - start
+        _observe_request(request, response.status_code, elapsed)
         response.headers["X-Correlation-Id"] = correlation_id
         logger.info(
-            "Request handled in %.2f ms", elapsed * 1000,
+            "Request handled in %.2f ms (%d queries, %.2f ms in Mongo)",
+            elapsed * 1000, query_stats["count"], query_stats["ms"],
             extra={
                 "correlation_id": correlation_id,
                 "url": str(request.url),
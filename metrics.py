@@ -0,0 +1,110 @@
+import os
+from typing import Callable, Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status code.",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_LATENCY = Histogram(
+    "mongo_operation_duration_seconds",
+    "MongoDB command latency by collection, command and outcome.",
+    ["collection", "operation", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+EXPENSE_FETCH_LATENCY = Histogram(
+    "expense_fetch_duration_seconds",
+    "Latency of soa-expense calls by base URL and outcome.",
+    ["base_url", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_POOL_WAIT = Histogram(
+    "mongo_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the Mongo pool, by outcome.",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+EXPENSE_SYNC_BYTES = Histogram(
+    "expense_sync_bytes",
+    "Response bytes transferred from soa-expense per sync, by mode (delta, full).",
+    ["mode"],
+    buckets=SIZE_BUCKETS,
+)
+EXPENSE_SYNC_ITEMS = Histogram(
+    "expense_sync_items",
+    "Expense items transferred from soa-expense per sync, by mode (delta, full).",
+    ["mode"],
+    buckets=COUNT_BUCKETS,
+)
+CONDITIONAL_GETS = Counter(
+    "conditional_get_requests_total",
+    "ETag-aware listing requests by route and outcome (not_modified, modified, unconditional).",
+    ["route", "outcome"],
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejected_requests_total",
+    "Requests turned away before reaching a handler, by reason (rate_limited, overloaded).",
+    ["reason"],
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class _StatsCollector:
+    """
+    Exposes the plain stats dicts kept by services (caches, log shipping, ...)
+    at scrape time, so the hot paths only bump integers. In multi-worker
+    mode these are per process, so each series carries the worker's pid.
+    """
+
+    def __init__(self):
+        self.sources: dict[str, tuple[Callable[[], dict], frozenset]] = {}
+        self.labels: dict[str, str] = {}
+
+    def collect(self):
+        for prefix, (read, counters) in list(self.sources.items()):
+            try:
+                stats = read() or {}
+            except Exception:
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                family = CounterMetricFamily if key in counters else GaugeMetricFamily
+                metric = family(name, f"{prefix} {key}", labels=list(self.labels))
+                metric.add_metric(list(self.labels.values()), value)
+                yield metric
+
+
+_stats_collector = _StatsCollector()
+REGISTRY.register(_stats_collector)
+
+
+def register_stats(prefix: str, read: Callable[[], dict], counters: Iterable[str] = ()):
+    """
+    Publishes the numeric values of `read()` as `<prefix>_<key>` metrics;
+    keys listed in `counters` are exported as counters, the rest as gauges.
+    """
+    _stats_collector.sources[prefix] = (read, frozenset(counters))
+
+
+def render_metrics() -> bytes:
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return generate_latest(REGISTRY)
+    # Histograms and counters are summed across workers from the shared directory.
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    _stats_collector.labels = {"pid": str(os.getpid())}
+    registry.register(_stats_collector)
+    return generate_latest(registry)
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel, field_serializer
 
 class BudgetRequest(BaseModel):
@@ -10,10 +11,33 @@ class BudgetResponse(BaseModel):
     budget_id: str
     month: str
     category_id: str
-    limit: str
+    limit: float
     created_at: datetime
     updated_at: datetime
     
     @field_serializer("created_at", "updated_at", mode="plain", when_used="json")
     def serialize_datetime(self, value: datetime) -> str:
-        return value.strftime("%Y%m%d %H:%M:%S")
\ No newline at end of file
+        return value.strftime("%Y%m%d %H:%M:%S")
+
+class BudgetPage(BaseModel):
+    items: List[BudgetResponse]
+    next_cursor: Optional[str] = None
+
+class BudgetUpsertResponse(BaseModel):
+    message: str
+    budget_id: str
+
+class BudgetBulkResult(BaseModel):
+    row: int
+    status: str
+    month: Optional[str] = None
+    category_id: Optional[str] = None
+    budget_id: Optional[str] = None
+    error: Optional[str] = None
+
+class BudgetBulkResponse(BaseModel):
+    created: int
+    updated: int
+    skipped: int
+    error: int
+    results: List[BudgetBulkResult]
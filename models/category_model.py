@@ -1,23 +1,68 @@
 from datetime import datetime
-from typing import List
-from pydantic import BaseModel, field_serializer
+from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, field_serializer
 
 class CategoryRequest(BaseModel):
     name: str
     
 class CategoryItem(BaseModel):
-    item_id: str
-    item_name: str
-    item_price: float
-    item_quantity: int
+    # Items are copied from soa-expense as they come: keep any extra fields it
+    # sends and accept the id and quantity types it uses, or their absence.
+    model_config = ConfigDict(extra="allow")
+
+    item_id: str | int | None = None
+    item_name: str | None = None
+    item_price: float = 0.0
+    item_quantity: int | float = 1
     created_at: str | None = None
-class CategoryResponse(BaseModel):
+
+class CategorySummary(BaseModel):
     category_id: str
     name: str
-    items: List[CategoryItem]
+    item_count: int
     created_at: datetime
     updated_at: datetime
     
     @field_serializer("created_at", "updated_at", mode="plain", when_used="json")
     def serialize_datetime(self, value: datetime) -> str:
-        return value.strftime("%Y/%m/%d %H:%M:%S")
\ No newline at end of file
+        return value.strftime("%Y/%m/%d %H:%M:%S")
+
+class CategoryResponse(CategorySummary):
+    items: List[CategoryItem]
+
+class CategorySummaryPage(BaseModel):
+    items: List[CategorySummary]
+    next_cursor: Optional[str] = None
+
+class CategoryPage(BaseModel):
+    items: List[CategoryResponse]
+    next_cursor: Optional[str] = None
+
+class CategoryItemPage(BaseModel):
+    items: List[CategoryItem]
+    next_cursor: Optional[str] = None
+
+class CategoryCreated(BaseModel):
+    message: str
+    category_id: str
+    name: str
+    items: List[CategoryItem]
+
+class CategoryCreateResponse(BaseModel):
+    message: str
+    category_id: CategoryCreated
+
+class CategoryUpdateResponse(BaseModel):
+    message: str
+    category_id: str
+    name: str
+    items: List[CategoryItem]
+    item_count: int
+    updated_at: datetime
+
+    @field_serializer("updated_at", mode="plain", when_used="json")
+    def serialize_datetime(self, value: datetime) -> str:
+        return value.strftime("%Y/%m/%d %H:%M:%S")
+
+class MessageResponse(BaseModel):
+    message: str
@@ -1,8 +1,10 @@
-from fastapi import HTTPException, status, Header
+from fastapi import Depends, HTTPException, status, Header
 from typing import Optional
+from services.admission import RateLimiter, retry_after_header
 from services.jwt_service import JWTService
 
 jwt_service = JWTService()
+rate_limiter = RateLimiter()
 
 async def verify_jwt_token(
     authorization: Optional[str] = Header(None, alias="Authorization")
@@ -58,3 +60,19 @@ async def verify_jwt_token(
         "username": username
     }
 
+
+async def rate_limited_user(current_user: dict = Depends(verify_jwt_token)) -> dict:
+    """
+    FastAPI dependency: verify_jwt_token plus the per-user token bucket.
+
+    Raises:
+        HTTPException: 429 with Retry-After when the user is over RATE_LIMIT_USER_RPS
+    """
+    retry_after = await rate_limiter.acquire(current_user["user_id"])
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded",
+            headers=retry_after_header(retry_after),
+        )
+    return current_user
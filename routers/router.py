@@ -1,114 +1,307 @@
-from fastapi import APIRouter, Path, status, HTTPException, Query, Body, Depends
-from models.category_model import CategoryRequest
-from models.budget_model import BudgetRequest
+import csv
+import json
+from typing import AsyncIterator, List
+from fastapi import APIRouter, BackgroundTasks, Path, Request, Response, status, HTTPException, Query, Body, Depends
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+from models.category_model import (
+    CategoryRequest, CategoryResponse, CategoryPage, CategorySummary, CategorySummaryPage, CategoryItemPage,
+    CategoryCreateResponse, CategoryUpdateResponse, MessageResponse,
+)
+from models.budget_model import BudgetRequest, BudgetResponse, BudgetPage, BudgetUpsertResponse, BudgetBulkResponse
 from services.category_service import CategoryService
 from services.budget_service import BudgetService
-from routers.auth_dependency import verify_jwt_token
+from services.registry import get_budget_service, get_category_service
+from services.pagination import MAX_PAGE_SIZE
+from services.user_versions import etag_matches, weak_etag
+from routers.auth_dependency import rate_limited_user, verify_jwt_token
+from metrics import CONDITIONAL_GETS
 
-router = APIRouter(prefix="/{user_id}", tags=["category-budget"])
+# Rate limiting runs before the route's own dependencies; verify_jwt_token is
+# resolved once per request and shared with the handlers' `current_user`.
+router = APIRouter(prefix="/{user_id}", tags=["category-budget"], dependencies=[Depends(rate_limited_user)])
 
-category_service = CategoryService()
-budget_service = BudgetService()
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
 
-@router.post("/categories/create", status_code=status.HTTP_201_CREATED)
+def _wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def _ndjson_response(rows: AsyncIterator[dict], model: type[BaseModel], etag: str | None = None) -> StreamingResponse:
+    """
+    Streams one JSON document per line as rows come off the Mongo cursor,
+    serialized through the same response model as the JSON listing.
+    """
+    async def body():
+        async for row in rows:
+            yield model.model_validate(row).model_dump_json() + "\n"
+
+    headers = {"ETag": etag} if etag else None
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+async def _listing_etag(request: Request, versions, user_id: str, kind: str, digest: str = "") -> tuple[str, bool]:
+    """
+    Returns the listing's weak ETag and whether If-None-Match already has it.
+    Only the per-user version is read; the body is not built. `digest` covers
+    inputs of the listing that the version does not (see `listing_snapshot`).
+    """
+    variant = f"{request.url.query}|{_wants_ndjson(request)}|{digest}"
+    etag = weak_etag(kind, await versions.get(user_id, kind), variant)
+    if_none_match = request.headers.get("if-none-match")
+    matched = etag_matches(if_none_match, etag)
+    outcome = "not_modified" if matched else ("modified" if if_none_match else "unconditional")
+    CONDITIONAL_GETS.labels(kind, outcome).inc()
+    return etag, matched
+
+async def _body_lines(request: Request) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+async def _bulk_rows(request: Request) -> AsyncIterator:
+    """
+    Yields raw budget rows from a JSON array, NDJSON or CSV (header
+    `month,category_id,limit`) body, chosen by Content-Type. NDJSON and CSV
+    are parsed line by line as the body streams in.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type == NDJSON_MEDIA_TYPE:
+        async for line in _body_lines(request):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield line
+    elif content_type == "text/csv":
+        header = None
+        async for line in _body_lines(request):
+            if not line.strip():
+                continue
+            values = [v.strip() for v in next(csv.reader([line]))]
+            if header is None:
+                header = values
+                continue
+            yield dict(zip(header, values))
+    else:
+        try:
+            data = json.loads(await request.body())
+        except ValueError:
+            raise ValueError("Body must be a JSON array of budgets")
+        if not isinstance(data, list):
+            raise ValueError("Body must be a JSON array of budgets")
+        for row in data:
+            yield row
+
+@router.post("/categories/create", status_code=status.HTTP_201_CREATED, response_model=CategoryCreateResponse)
 async def create_category(
     user_id: str = Path(...), 
     payload: CategoryRequest = Body(...),
+    category_service: CategoryService = Depends(get_category_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     try:
-        category_id = category_service.create_category(user_id, payload)
+        category_id = await category_service.create_category(user_id, payload)
         return {"message": "Category created successfully", "category_id": category_id}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/categories", status_code=status.HTTP_200_OK)
+# One response model per query mode, keyed by (include_items, paginated).
+# Picking it explicitly means a row that does not fit fails loudly instead of
+# a union silently serializing it through another member (e.g. without items).
+CATEGORY_LISTING_MODELS = {
+    (False, False): TypeAdapter(List[CategorySummary]),
+    (False, True): TypeAdapter(CategorySummaryPage),
+    (True, False): TypeAdapter(List[CategoryResponse]),
+    (True, True): TypeAdapter(CategoryPage),
+}
+
+@router.get(
+    "/categories",
+    status_code=status.HTTP_200_OK,
+    response_model=None,
+    responses={200: {"model": List[CategorySummary] | CategorySummaryPage | List[CategoryResponse] | CategoryPage}},
+)
 async def get_categories(
+    request: Request,
+    background_tasks: BackgroundTasks,
     user_id: str = Path(...),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    include_items: bool = Query(False),
+    category_service: CategoryService = Depends(get_category_service),
+    current_user: dict = Depends(verify_jwt_token)
+):
+    if current_user["user_id"] != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    # Without locally maintained items the listing backfills from the expense
+    # snapshot, so a changed snapshot must change the ETag as well.
+    expenses, digest = await category_service.listing_snapshot(user_id)
+    etag, not_modified = await _listing_etag(request, category_service.versions, user_id, "categories", digest)
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    try:
+        if _wants_ndjson(request):
+            rows = await category_service.iter_categories(
+                user_id, limit, cursor, background_tasks, include_items, expenses
+            )
+            return _ndjson_response(rows, CategoryResponse if include_items else CategorySummary, etag)
+        result = await category_service.get_categories(user_id, background_tasks, limit, cursor, include_items, expenses)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Outside the try: a ValidationError (a ValueError) here is a server bug, not a bad request.
+    adapter = CATEGORY_LISTING_MODELS[include_items, limit is not None or cursor is not None]
+    return Response(adapter.dump_json(adapter.validate_python(result)), media_type="application/json", headers={"ETag": etag})
+
+@router.get("/categories/{category_id}/items", status_code=status.HTTP_200_OK, response_model=CategoryItemPage)
+async def get_category_items(
+    request: Request,
+    response: Response,
+    user_id: str = Path(...),
+    category_id: str = Path(...),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    category_service: CategoryService = Depends(get_category_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
-    return category_service.get_categories(user_id)
+    # Items only change together with the categories listing, so they share its version.
+    await category_service.sync_expenses(user_id)
+    etag, not_modified = await _listing_etag(request, category_service.versions, user_id, "categories")
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    try:
+        page = await category_service.get_category_items(user_id, category_id, limit, cursor)
+    except ValueError as e:
+        status_code = 404 if str(e) == "Category not found" else 400
+        raise HTTPException(status_code=status_code, detail=str(e))
+    response.headers["ETag"] = etag
+    return page
 
-@router.put("/categories/{category_id}/update", status_code=status.HTTP_200_OK)
+@router.put("/categories/{category_id}/update", status_code=status.HTTP_200_OK, response_model=CategoryUpdateResponse)
 async def update_category(
     user_id: str = Path(...), 
     category_id: str = Path(...), 
     payload: CategoryRequest = Body(...),
+    category_service: CategoryService = Depends(get_category_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     try:
-        return category_service.update_category(user_id, category_id, payload)
+        return await category_service.update_category(user_id, category_id, payload)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.delete("/categories/{category_id}/delete", status_code=status.HTTP_200_OK)
+@router.delete("/categories/{category_id}/delete", status_code=status.HTTP_200_OK, response_model=MessageResponse)
 async def delete_category(
     user_id: str = Path(...), 
     category_id: str = Path(...),
+    category_service: CategoryService = Depends(get_category_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     try:
-        return category_service.delete_category(user_id, category_id)
+        return await category_service.delete_category(user_id, category_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.post("/budgets/upsert", status_code=status.HTTP_200_OK)
+@router.post("/expenses/invalidate", status_code=status.HTTP_202_ACCEPTED, response_model=MessageResponse)
+async def invalidate_expenses(
+    user_id: str = Path(...),
+    category_service: CategoryService = Depends(get_category_service),
+    current_user: dict = Depends(verify_jwt_token)
+):
+    if current_user["user_id"] != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    await category_service.invalidate_expenses(user_id)
+    return {"message": "Expense cache invalidated"}
+
+@router.post("/budgets/upsert", status_code=status.HTTP_200_OK, response_model=BudgetUpsertResponse)
 async def upsert_budget(
     user_id: str = Path(...), 
     payload: BudgetRequest = Body(...),
+    budget_service: BudgetService = Depends(get_budget_service),
+    current_user: dict = Depends(verify_jwt_token)
+):
+    if current_user["user_id"] != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    try:
+        return await budget_service.upsert_budget(user_id, payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/budgets/bulk", status_code=status.HTTP_200_OK, response_model=BudgetBulkResponse, response_model_exclude_none=True)
+async def bulk_upsert_budgets(
+    request: Request,
+    user_id: str = Path(...),
+    budget_service: BudgetService = Depends(get_budget_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     try:
-        return budget_service.upsert_budget(user_id, payload)
+        return await budget_service.bulk_upsert_budgets(user_id, _bulk_rows(request))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/budgets", status_code=status.HTTP_200_OK)
+@router.get("/budgets", status_code=status.HTTP_200_OK, response_model=List[BudgetResponse] | BudgetPage)
 async def get_budgets(
+    request: Request,
+    response: Response,
     user_id: str = Path(...), 
     month: str | None = Query(None),
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = Query(None),
+    budget_service: BudgetService = Depends(get_budget_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    etag, not_modified = await _listing_etag(request, budget_service.versions, user_id, "budgets")
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
     try:
-        return budget_service.get_budgets(user_id, month)
+        if _wants_ndjson(request):
+            rows = await budget_service.iter_budgets(user_id, month, limit, cursor)
+            return _ndjson_response(rows, BudgetResponse, etag)
+        response.headers["ETag"] = etag
+        return await budget_service.get_budgets(user_id, month, limit, cursor)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.delete("/budgets/{budget_id}/delete", status_code=status.HTTP_200_OK)
+@router.delete("/budgets/{budget_id}/delete", status_code=status.HTTP_200_OK, response_model=MessageResponse)
 async def delete_budget(
     user_id: str = Path(...), 
     budget_id: str = Path(...),
+    budget_service: BudgetService = Depends(get_budget_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     try:
-        return budget_service.delete_budget(user_id, budget_id)
+        return await budget_service.delete_budget(user_id, budget_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.put("/budgets/{budget_id}/update", status_code=status.HTTP_200_OK)
+@router.put("/budgets/{budget_id}/update", status_code=status.HTTP_200_OK, response_model=MessageResponse)
 async def update_budget(
     user_id: str = Path(...),
     budget_id: str = Path(...),
     payload: BudgetRequest = Body(...),
+    budget_service: BudgetService = Depends(get_budget_service),
     current_user: dict = Depends(verify_jwt_token)
 ):
     if current_user["user_id"] != user_id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
     try:
-        return budget_service.update_budget(user_id, budget_id, payload)
+        return await budget_service.update_budget(user_id, budget_id, payload)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
@@ -1,16 +1,104 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from routers.router import router
-from logging_utils import init_request_logging
+from routers.auth_dependency import jwt_service, rate_limiter
+from logging_utils import init_request_logging, get_logger, get_rabbit_handler, start_log_shipping, stop_log_shipping
+from metrics import CONTENT_TYPE, register_stats, render_metrics
+from db.database import close_client, get_db, pool_stats
+from db.indexes import apply_migrations
+from services.expense_client import close_http_client, get_http_client
+from services.expense_events import ExpenseEventConsumer, ExpenseItemProjector
+from services.admission import InFlightLimitMiddleware, in_flight_stats
+from services.registry import get_budget_service, get_category_service
+import argparse
+import tempfile
 import uvicorn
 import os
 
+async def _warm_up():
+    """
+    Opens Mongo pool connections and the soa-expense HTTP pool ahead of
+    traffic, so the first requests do not pay for handshakes.
+    """
+    connections = int(os.getenv("STARTUP_WARMUP_MONGO_CONNECTIONS", "4"))
+    db = get_db()
+    # Concurrent commands each check out their own pooled connection.
+    await asyncio.gather(*(db.command("ping") for _ in range(connections)))
+    get_http_client()
+
+
+def _consume_in_process() -> bool:
+    return os.getenv("EXPENSE_EVENTS_CONSUME", "false").lower() in ("1", "true", "yes")
+
+
+async def _startup(app: FastAPI):
+    """
+    Runs after the server is already accepting connections, so /healthz
+    answers while Mongo, migrations and warm-up are still in progress;
+    /readyz turns 200 once this finishes.
+    """
+    start = time.perf_counter()
+    try:
+        if os.getenv("MONGODB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes"):
+            try:
+                await apply_migrations(get_db())
+            except Exception as e:
+                get_logger().error("Index migration failed: %s", e)
+        category_service = get_category_service()
+        get_budget_service()
+        if _consume_in_process():
+            # Every worker starts one; the exclusive consume lets only one of them receive events.
+            projector = ExpenseItemProjector(
+                get_db(), category_service.expense_client, on_change=category_service.invalidate_expenses
+            )
+            app.state.consumer = ExpenseEventConsumer(projector, asyncio.get_running_loop())
+            register_stats(
+                "expense_events", lambda: {**projector.stats, **app.state.consumer.stats},
+                counters=("applied", "stale", "ignored", "retries", "dead_lettered"),
+            )
+            app.state.consumer.start()
+        if os.getenv("STARTUP_WARMUP", "false").lower() in ("1", "true", "yes"):
+            try:
+                await _warm_up()
+            except Exception as e:
+                # Readiness still pings Mongo, so a failed warm-up only costs the head start.
+                get_logger().warning("Warm-up failed: %s", e)
+    except Exception as e:
+        app.state.startup_error = str(e)
+        get_logger().exception("Startup failed: %s", e)
+        return
+    app.state.ready = True
+    get_logger().info("Service ready in %.2f ms", (time.perf_counter() - start) * 1000)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_log_shipping()
+    startup = asyncio.create_task(_startup(app))
+    yield
+    startup.cancel()
+    await asyncio.gather(startup, return_exceptions=True)
+    if app.state.consumer is not None:
+        # The consumer thread may be waiting on this loop, so join it off-loop.
+        await asyncio.to_thread(app.state.consumer.stop)
+    await close_http_client()
+    await close_client()
+    await asyncio.to_thread(stop_log_shipping)
+
 app = FastAPI(
     title="Category & Budget Service",
     version="1.0.0",
     swagger_ui_parameters={"persistAuthorization": True},
+    lifespan=lifespan,
 )
+app.state.ready = False
+app.state.startup_error = None
+app.state.consumer = None
 
 def get_allowed_origins():
     env_origins = os.getenv("CORS_ORIGINS")
@@ -24,17 +112,85 @@ def get_allowed_origins():
         for port in common_ports
     ]
 
+# Added first so it runs innermost: shed requests still get CORS headers and
+# show up in the request log and latency metrics.
+app.add_middleware(InFlightLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=get_allowed_origins(),
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Retry-After"],
 )
 
 init_request_logging(app, "soa-category-budget")
 app.include_router(router)
 
+
+def _log_shipping_stats():
+    handler = get_rabbit_handler()
+    return handler.stats() if handler else {}
+
+
+register_stats(
+    "expense_cache", lambda: get_category_service().expense_cache.stats(),
+    counters=("hits", "misses", "invalidations", "evictions"),
+)
+register_stats("jwt_cache", jwt_service.cache_stats, counters=("hits", "misses"))
+register_stats(
+    "category_backfill", lambda: get_category_service().backfill_stats,
+    counters=("requests", "requests_with_backfill", "documents"),
+)
+register_stats(
+    "expense_sync", lambda: getattr(get_category_service().expense_sync, "stats", {}),
+    counters=("delta_syncs", "full_syncs", "failures", "bytes", "items", "merged"),
+)
+register_stats(
+    "mongo_pool", pool_stats,
+    counters=("checkouts", "checkout_failures", "checkout_wait_ms", "pool_clears"),
+)
+register_stats("rate_limit", rate_limiter.stats, counters=("allowed", "limited", "store_errors", "evictions"))
+register_stats("admission", in_flight_stats, counters=("admitted", "rejected"))
+register_stats(
+    "log_shipping", _log_shipping_stats,
+    counters=("queued", "dropped", "published", "publish_errors", "spooled", "spool_dropped"),
+)
+
+
+@app.get("/healthz", include_in_schema=False)
+def healthz():
+    """
+    Liveness: the process is up and its event loop responds.
+    """
+    return {"status": "ok"}
+
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """
+    Readiness: startup (migrations, services, warm-up) finished and MongoDB
+    answers a ping.
+    """
+    if not app.state.ready:
+        status = "failed" if app.state.startup_error else "starting"
+        return JSONResponse({"status": status, "detail": app.state.startup_error}, status_code=503)
+    timeout = float(os.getenv("READINESS_MONGO_TIMEOUT_S", "1"))
+    try:
+        await asyncio.wait_for(get_db().command("ping"), timeout)
+    except Exception as e:
+        return JSONResponse({"status": "unavailable", "detail": f"mongo: {e}"}, status_code=503)
+    return {"status": "ready"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint.
+    """
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
 def custom_openapi():
     """
     Inject HTTP Bearer auth scheme so Swagger shows the Authorize button for JWT.
@@ -65,5 +221,27 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
+def main():
+    """
+    Runs the API. With more than one worker, uvicorn starts separate worker
+    processes; each builds its own Mongo client, services and log publisher
+    on first use, and Prometheus metrics are aggregated across workers
+    through PROMETHEUS_MULTIPROC_DIR.
+    """
+    parser = argparse.ArgumentParser(description="Category & Budget Service")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        uvicorn.run(app, host=args.host, port=args.port)
+        return
+    # Must be set before the workers import prometheus_client.
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="soa-category-budget-metrics-")
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers)
+
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    main()
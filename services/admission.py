@@ -0,0 +1,223 @@
+"""
+Admission control: requests that would only add to an overload are turned
+away before they reach a handler, Mongo or soa-expense.
+
+- Per-user rate limit: a token bucket per authenticated user_id (RATE_LIMIT_USER_RPS
+  tokens per second, at most RATE_LIMIT_USER_BURST saved up). Enforced by the
+  `rate_limited_user` dependency; over the limit answers 429 with Retry-After.
+- In-flight cap: at most MAX_IN_FLIGHT_REQUESTS requests per process are
+  handled at once; the rest get 503 with Retry-After right away instead of
+  queueing behind them. Health and metrics endpoints are never shed.
+
+Both limits are per process. With the default in-memory store each worker
+keeps its own buckets; pass a shared store (e.g. `RedisTokenBucketStore`) to
+enforce one limit across workers and instances.
+"""
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Protocol
+
+from logging_utils import get_correlation_id
+from metrics import ADMISSION_REJECTIONS
+
+EXEMPT_PATHS = frozenset({"/healthz", "/readyz", "/metrics"})
+
+
+def _admission_config():
+    return {
+        "user_rps": float(os.getenv("RATE_LIMIT_USER_RPS", "10")),
+        "user_burst": float(os.getenv("RATE_LIMIT_USER_BURST", "20")),
+        "max_users": int(os.getenv("RATE_LIMIT_MAX_USERS", "10000")),
+        "max_in_flight": int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "256")),
+        "overload_retry_after_s": float(os.getenv("OVERLOAD_RETRY_AFTER_S", "1")),
+    }
+
+
+class TokenBucketStore(Protocol):
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """
+        Takes `cost` tokens from the bucket of `key`. Returns 0 when they were
+        available, otherwise the seconds until they will be (nothing is taken).
+        """
+        ...
+
+
+class InMemoryTokenBucketStore:
+    """
+    Process-local buckets, LRU bounded by key count. An evicted bucket comes
+    back full, which only matters for keys idle long enough to refill anyway.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.evictions = 0
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+        return wait
+
+
+# KEYS[1] bucket; ARGV rate, burst, cost, now (s). Stored as a hash of tokens
+# and timestamp, expiring once it would be full again.
+_REDIS_TAKE = """
+local rate, burst, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucketStore:
+    """
+    Shared buckets for multiple workers and instances. Takes an already
+    configured asyncio Redis client (e.g. `redis.asyncio.Redis`); each take is
+    one atomic script call.
+    """
+
+    def __init__(self, redis, prefix: str = "rate-limit:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        wait = await self.redis.eval(_REDIS_TAKE, 1, self.prefix + key, rate, burst, cost, time.time())
+        return float(wait.decode() if isinstance(wait, bytes) else wait)
+
+
+class RateLimiter:
+    """
+    Per-user token bucket. A store error lets the request through: losing the
+    limiter must not take the API down with it.
+    """
+
+    def __init__(self, store: Optional[TokenBucketStore] = None,
+                 rate: Optional[float] = None, burst: Optional[float] = None):
+        self.logger = logging.getLogger("soa-category-budget")
+        cfg = _admission_config()
+        self.rate = cfg["user_rps"] if rate is None else rate
+        self.burst = max(1.0, cfg["user_burst"] if burst is None else burst)
+        if store is None:
+            store = InMemoryTokenBucketStore(cfg["max_users"])
+        self.store = store
+        self.counters = {"allowed": 0, "limited": 0, "store_errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    async def acquire(self, user_id: str, cost: float = 1.0) -> float:
+        """
+        Returns 0 when the request may proceed, otherwise the seconds to wait.
+        """
+        if not self.enabled:
+            return 0.0
+        try:
+            wait = await self.store.take(user_id, self.rate, self.burst, cost)
+        except Exception as e:
+            self.counters["store_errors"] += 1
+            self.logger.warning(
+                "Rate limit store failed, admitting request: %s", e,
+                extra={"correlation_id": get_correlation_id(), "detail": f"user_id={user_id}"},
+            )
+            return 0.0
+        if wait > 0:
+            self.counters["limited"] += 1
+            ADMISSION_REJECTIONS.labels("rate_limited").inc()
+            return wait
+        self.counters["allowed"] += 1
+        return 0.0
+
+    def stats(self) -> dict:
+        out = {**self.counters, "rate_per_s": self.rate, "burst": self.burst}
+        if isinstance(self.store, InMemoryTokenBucketStore):
+            out.update({"tracked_users": len(self.store), "evictions": self.store.evictions})
+        return out
+
+
+def retry_after_header(seconds: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
+
+
+class InFlightLimitMiddleware:
+    """
+    ASGI middleware capping concurrently handled requests. A request counts
+    until its response (including a streamed body) has been sent.
+    """
+
+    def __init__(self, app, max_in_flight: Optional[int] = None, retry_after_s: Optional[float] = None):
+        self.app = app
+        self.logger = logging.getLogger("soa-category-budget")
+        cfg = _admission_config()
+        self.max_in_flight = cfg["max_in_flight"] if max_in_flight is None else max_in_flight
+        self.retry_after_s = cfg["overload_retry_after_s"] if retry_after_s is None else retry_after_s
+        self.in_flight = 0
+        self.counters = {"admitted": 0, "rejected": 0}
+        _in_flight_limiters.append(self)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_in_flight <= 0 or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        if self.in_flight >= self.max_in_flight:
+            self.counters["rejected"] += 1
+            ADMISSION_REJECTIONS.labels("overloaded").inc()
+            self.logger.warning(
+                "Shedding request, %d requests in flight", self.in_flight,
+                extra={"correlation_id": get_correlation_id(), "path": scope["path"]},
+            )
+            await self._reject(send)
+            return
+        self.in_flight += 1
+        self.counters["admitted"] += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": "Server is overloaded, retry later"}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        headers += [(k.lower().encode(), v.encode()) for k, v in retry_after_header(self.retry_after_s).items()]
+        await send({"type": "http.response.start", "status": 503, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": self.in_flight, "max_in_flight": self.max_in_flight}
+
+
+# Starlette builds the middleware stack lazily, so server.py reads the stats
+# through this list instead of holding the instance.
+_in_flight_limiters: list[InFlightLimitMiddleware] = []
+
+
+def in_flight_stats() -> dict:
+    return _in_flight_limiters[-1].stats() if _in_flight_limiters else {}
@@ -1,29 +1,52 @@
 import logging
+import os
 import re
 from datetime import datetime
+from typing import AsyncIterable, AsyncIterator
 from bson import ObjectId
-from db.database import get_db
+from pydantic import ValidationError
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from db.database import get_db, get_read_db
 from models.budget_model import BudgetRequest
 from logging_utils import get_correlation_id
+from services.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from services.user_versions import UserVersions
 
 MONTH_RE = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
 
+def _first_error(exc: ValidationError) -> str:
+    err = exc.errors()[0]
+    field = ".".join(str(part) for part in err["loc"])
+    return f"{field}: {err['msg']}" if field else err["msg"]
+
 class BudgetService:
     def __init__(self):
         self.logger = logging.getLogger("soa-category-budget")
         self.db = get_db()
         self.budgets = self.db["budget_data"]
         self.categories = self.db["category_data"]
+        # Listings read through MONGODB_READ_PREFERENCE; writes and ownership checks use the primary.
+        self.read_budgets = get_read_db()["budget_data"]
+        self.bulk_max_rows = int(os.getenv("BUDGET_BULK_MAX_ROWS", "5000"))
+        self.versions = UserVersions(self.db, get_read_db())
 
-    def upsert_budget(self, user_id: str, payload: BudgetRequest):
+    async def _ensure_category_owned(self, user_id: str, category_id: str):
+        # Checked on the primary on every write: a cached positive answer would
+        # outlive deletes made by other workers or instances.
+        cat = await self.categories.find_one(
+            {"_id": ObjectId(category_id), "user_id": user_id}, projection={"_id": 1}
+        )
+        if not cat:
+            raise ValueError("Category not found")
+
+    async def upsert_budget(self, user_id: str, payload: BudgetRequest):
         if not MONTH_RE.match(payload.month):
             raise ValueError("month must be in YYYY-MM format")
         if payload.limit <= 0:
             raise ValueError("limit must be greater than 0")
 
-        cat = self.categories.find_one({"_id": ObjectId(payload.category_id), "user_id": user_id})
-        if not cat:
-            raise ValueError("Category not found")
+        await self._ensure_category_owned(user_id, payload.category_id)
 
         query = {
             "user_id": user_id,
@@ -32,64 +55,196 @@ class BudgetService:
         }
 
         now = datetime.now()
-        existing = self.budgets.find_one(query)
-
-        if existing:
-            self.budgets.update_one(
-                {"_id": existing["_id"]},
-                {"$set": {"limit": float(payload.limit), "updated_at": now}}
+        new_id = ObjectId()
+        update = {
+            "$set": {"limit": float(payload.limit), "updated_at": now},
+            "$setOnInsert": {"_id": new_id, "created_at": now},
+        }
+        try:
+            doc = await self.budgets.find_one_and_update(
+                query, update, projection={"_id": 1}, upsert=True,
+                return_document=ReturnDocument.AFTER,
             )
-            self.logger.info(
-                "Budget updated",
-                extra={
-                    "correlation_id": get_correlation_id(),
-                    "path": f"/{user_id}/budgets/upsert",
-                    "detail": f"budget_id={existing['_id']}",
-                },
+        except DuplicateKeyError:
+            # A concurrent upsert inserted the same key first; this one now matches it.
+            doc = await self.budgets.find_one_and_update(
+                query, update, projection={"_id": 1}, upsert=True,
+                return_document=ReturnDocument.AFTER,
             )
-            return {"message": "Budget updated successfully", "budget_id": str(existing["_id"])}
 
-        doc = {
-            **query,
-            "limit": float(payload.limit),
-            "created_at": now,
-            "updated_at": now
-        }
-        res = self.budgets.insert_one(doc)
+        await self.versions.bump(user_id, "budgets")
+        created = doc["_id"] == new_id
         self.logger.info(
-            "Budget created",
+            "Budget created" if created else "Budget updated",
             extra={
                 "correlation_id": get_correlation_id(),
                 "path": f"/{user_id}/budgets/upsert",
-                "detail": f"budget_id={res.inserted_id}",
+                "detail": f"budget_id={doc['_id']}",
+            },
+        )
+        if created:
+            return {"message": "Budget created successfully", "budget_id": str(doc["_id"])}
+        return {"message": "Budget updated successfully", "budget_id": str(doc["_id"])}
+
+    async def bulk_upsert_budgets(self, user_id: str, rows: AsyncIterable[dict]) -> dict:
+        """
+        Validates every row against one prefetched set of the user's category
+        ids and applies all valid rows with a single unordered upsert
+        bulk_write. Returns a per-row report; invalid rows do not stop the rest.
+        """
+        owned = {
+            str(d["_id"])
+            async for d in self.categories.find({"user_id": user_id}, projection={"_id": 1})
+        }
+        results: list[dict] = []
+        valid: dict[tuple[str, str], tuple[int, float]] = {}
+        async for raw in rows:
+            row = len(results)
+            if row >= self.bulk_max_rows:
+                raise ValueError(f"at most {self.bulk_max_rows} rows are allowed per request")
+            results.append({"row": row})
+            try:
+                payload = BudgetRequest.model_validate(raw)
+            except ValidationError as e:
+                results[row].update(status="error", error=_first_error(e))
+                continue
+            if not MONTH_RE.match(payload.month):
+                results[row].update(status="error", error="month must be in YYYY-MM format")
+            elif payload.limit <= 0:
+                results[row].update(status="error", error="limit must be greater than 0")
+            elif payload.category_id not in owned:
+                results[row].update(status="error", error="Category not found")
+            else:
+                key = (payload.month, payload.category_id)
+                if key in valid:
+                    previous = valid[key][0]
+                    results[previous].update(status="skipped", error=f"superseded by row {row}")
+                valid[key] = (row, float(payload.limit))
+
+        if valid:
+            now = datetime.now()
+            keys = list(valid)
+            new_ids = [ObjectId() for _ in keys]
+            ops = [
+                UpdateOne(
+                    {"user_id": user_id, "month": month, "category_id": category_id},
+                    {
+                        "$set": {"limit": valid[(month, category_id)][1], "updated_at": now},
+                        "$setOnInsert": {"_id": new_id, "created_at": now},
+                    },
+                    upsert=True,
+                )
+                for (month, category_id), new_id in zip(keys, new_ids)
+            ]
+            write_errors = {}
+            try:
+                await self.budgets.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                write_errors = {w["index"]: w.get("errmsg", "write failed") for w in e.details.get("writeErrors", [])}
+            await self.versions.bump(user_id, "budgets")
+
+            # One read resolves the ids; a stored _id equal to the one we generated means the row was inserted.
+            stored = {}
+            async for d in self.budgets.find(
+                {
+                    "user_id": user_id,
+                    "month": {"$in": sorted({month for month, _ in keys})},
+                    "category_id": {"$in": sorted({category_id for _, category_id in keys})},
+                },
+                projection={"month": 1, "category_id": 1},
+            ):
+                stored[(d["month"], d["category_id"])] = d["_id"]
+
+            for i, (key, new_id) in enumerate(zip(keys, new_ids)):
+                result = results[valid[key][0]]
+                result.update(month=key[0], category_id=key[1])
+                if i in write_errors or key not in stored:
+                    result.update(status="error", error=write_errors.get(i, "write failed"))
+                else:
+                    result.update(
+                        status="created" if stored[key] == new_id else "updated",
+                        budget_id=str(stored[key]),
+                    )
+
+        summary = {status_: 0 for status_ in ("created", "updated", "skipped", "error")}
+        for r in results:
+            summary[r["status"]] += 1
+        self.logger.info(
+            "Budgets bulk upserted",
+            extra={
+                "correlation_id": get_correlation_id(),
+                "path": f"/{user_id}/budgets/bulk",
+                "detail": ", ".join(f"{k}={v}" for k, v in summary.items()),
             },
         )
-        return {"message": "Budget created successfully", "budget_id": str(res.inserted_id)}
+        return {**summary, "results": results}
 
-    def get_budgets(self, user_id: str, month: str | None):
+    def _budget_query(self, user_id: str, month: str | None, cursor: str | None) -> dict:
         q = {"user_id": user_id}
         if month:
             if not MONTH_RE.match(month):
                 raise ValueError("month must be in YYYY-MM format")
             q["month"] = month
+        if cursor is not None:
+            after_month, after_id = decode_cursor(cursor, 2)
+            if not ObjectId.is_valid(after_id):
+                raise ValueError("Invalid cursor")
+            q["$or"] = [
+                {"month": {"$gt": after_month}},
+                {"month": after_month, "_id": {"$gt": ObjectId(after_id)}},
+            ]
+        return q
 
-        docs = self.budgets.find(q)
-        out = []
-        for d in docs:
-            out.append({
+    async def iter_budgets(
+        self,
+        user_id: str,
+        month: str | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Validates the request, then returns an async iterator that yields
+        budgets ordered by (month, _id) straight from the Mongo cursor.
+        """
+        find = self.read_budgets.find(self._budget_query(user_id, month, cursor)).sort([("month", 1), ("_id", 1)])
+        if limit is not None:
+            find = find.limit(limit)
+        return self._iter_budget_docs(find)
+
+    async def _iter_budget_docs(self, find):
+        async for d in find:
+            yield {
                 "budget_id": str(d["_id"]),
                 "month": d["month"],
                 "category_id": d["category_id"],
                 "limit": d["limit"],
                 "created_at": d["created_at"],
                 "updated_at": d["updated_at"]
-            })
-        return out
+            }
+
+    async def get_budgets(
+        self,
+        user_id: str,
+        month: str | None,
+        limit: int | None = None,
+        cursor: str | None = None,
+    ):
+        """
+        Without `limit`/`cursor` returns the full list (original response shape);
+        otherwise a page `{"items": [...], "next_cursor": ...}`.
+        """
+        if limit is None and cursor is None:
+            return [b async for b in await self.iter_budgets(user_id, month)]
 
-    def delete_budget(self, user_id: str, budget_id: str):
-        res = self.budgets.delete_one({"_id": ObjectId(budget_id), "user_id": user_id})
+        limit = limit or DEFAULT_PAGE_SIZE
+        rows = await self.iter_budgets(user_id, month, limit + 1, cursor)
+        return paginate([b async for b in rows], limit, lambda b: (b["month"], b["budget_id"]))
+
+    async def delete_budget(self, user_id: str, budget_id: str):
+        res = await self.budgets.delete_one({"_id": ObjectId(budget_id), "user_id": user_id})
         if res.deleted_count == 0:
             raise ValueError("Budget not found")
+        await self.versions.bump(user_id, "budgets")
         self.logger.info(
             "Budget deleted",
             extra={
@@ -100,17 +255,15 @@ class BudgetService:
         )
         return {"message": "Budget deleted successfully"}
     
-    def update_budget(self, user_id: str, budget_id: str, payload: BudgetRequest):
+    async def update_budget(self, user_id: str, budget_id: str, payload: BudgetRequest):
         if not MONTH_RE.match(payload.month):
             raise ValueError("month must be in YYYY-MM format")
         if payload.limit <= 0:
             raise ValueError("limit must be greater than 0")
 
-        cat = self.categories.find_one({"_id": ObjectId(payload.category_id), "user_id": user_id})
-        if not cat:
-            raise ValueError("Category not found")
+        await self._ensure_category_owned(user_id, payload.category_id)
 
-        res = self.budgets.update_one(
+        res = await self.budgets.update_one(
             {"_id": ObjectId(budget_id), "user_id": user_id},
             {"$set": {
                 "month": payload.month,
@@ -122,6 +275,7 @@ class BudgetService:
 
         if res.matched_count == 0:
             raise ValueError("Budget not found")
+        await self.versions.bump(user_id, "budgets")
 
         self.logger.info(
             "Budget updated",
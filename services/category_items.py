@@ -0,0 +1,284 @@
+"""
+Category items stored outside the category document, in buckets of up to
+CATEGORY_ITEM_BUCKET_SIZE items:
+
+    {"user_id": "...", "category_id": "<category _id as str>", "seq": 0,
+     "items": [...], "updated_at": ...}
+
+The category document keeps only `item_count`, so listings, renames and
+ownership checks never load or rewrite the items. Buckets are read in `seq`
+order; a page cursor is `(seq, offset)` where the offset may run past the end
+of bucket `seq` into the following ones.
+
+Categories written before buckets existed still embed `items` and have no
+`item_count`. Readers and writers handle both shapes; `migrate` moves the
+embedded items of each category into buckets while the API keeps serving:
+
+    python -m services.category_items status
+    python -m services.category_items migrate [--user USER_ID ...] [--batch-size 200]
+
+A category is switched over with a single update that only matches while its
+`updated_at` is unchanged; if a write raced the copy, its buckets are rewritten
+and the switch retried. Run it once every instance runs this version, since
+older code only knows the embedded `items`.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Iterable
+
+from bson import ObjectId
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from services.pagination import decode_cursor, encode_cursor
+
+ITEMS_COLLECTION = "category_items"
+MIGRATION_RETRIES = 5
+
+
+def _bucket_size() -> int:
+    return int(os.getenv("CATEGORY_ITEM_BUCKET_SIZE", "200"))
+
+
+def _chunks(items: list[dict], size: int) -> Iterable[list[dict]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class CategoryItemStore:
+    """
+    Reads and writes bucketed items. `db` is used for writes and reads that
+    must see them; listings pass the read handle as `read_db`.
+    """
+
+    def __init__(self, db, read_db=None, bucket_size: int | None = None):
+        self.logger = logging.getLogger("soa-category-budget")
+        self.col = db[ITEMS_COLLECTION]
+        self.read_col = (read_db if read_db is not None else db)[ITEMS_COLLECTION]
+        self.categories = db["category_data"]
+        self.bucket_size = bucket_size or _bucket_size()
+
+    def _bucket_ops(self, user_id: str, category_id: str, items: list[dict], now: datetime) -> list:
+        ops: list = [
+            ReplaceOne(
+                {"user_id": user_id, "category_id": category_id, "seq": seq},
+                {"user_id": user_id, "category_id": category_id, "seq": seq, "items": chunk, "updated_at": now},
+                upsert=True,
+            )
+            for seq, chunk in enumerate(_chunks(items, self.bucket_size))
+        ]
+        ops.append(DeleteMany({"user_id": user_id, "category_id": category_id, "seq": {"$gte": len(ops)}}))
+        return ops
+
+    async def write_buckets(self, user_id: str, items_by_category: dict[str, list[dict]]):
+        """
+        Replaces the buckets of each category with `items`. Idempotent, so
+        repeating it (e.g. two listings backfilling the same category) is safe.
+        """
+        now = datetime.now()
+        ops: list = []
+        for category_id, items in items_by_category.items():
+            ops.extend(self._bucket_ops(user_id, category_id, items, now))
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
+
+    async def replace_many(self, user_id: str, items_by_category: dict[str, list[dict]]):
+        """
+        Replaces the items of existing categories and stores their new
+        `item_count`; embedded items, if any, are dropped.
+        """
+        if not items_by_category:
+            return
+        await self.write_buckets(user_id, items_by_category)
+        now = datetime.now()
+        await self.categories.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(category_id), "user_id": user_id},
+                {"$set": {"item_count": len(items), "updated_at": now}, "$unset": {"items": ""}},
+            )
+            for category_id, items in items_by_category.items()
+        ], ordered=False)
+
+    async def append(self, user_id: str, category_id: str, items: list[dict]):
+        """
+        Appends items to the last bucket while it has room, then opens new
+        buckets, and bumps the category's `item_count`.
+        """
+        if not items:
+            return
+        now = datetime.now()
+        key = {"user_id": user_id, "category_id": category_id}
+        for chunk in _chunks(items, self.bucket_size):
+            while True:
+                last = await self.col.find_one(key, projection={"seq": 1}, sort=[("seq", -1)])
+                if last is not None:
+                    # `items.<n>` exists only when the bucket already holds more than n items.
+                    res = await self.col.update_one(
+                        {**key, "seq": last["seq"], f"items.{self.bucket_size - len(chunk)}": {"$exists": False}},
+                        {"$push": {"items": {"$each": chunk}}, "$set": {"updated_at": now}},
+                    )
+                    if res.matched_count:
+                        break
+                try:
+                    seq = last["seq"] + 1 if last is not None else 0
+                    await self.col.insert_one({**key, "seq": seq, "items": chunk, "updated_at": now})
+                    break
+                except DuplicateKeyError:
+                    # Another writer opened the same bucket; look again.
+                    continue
+        await self.categories.update_one(
+            {"_id": ObjectId(category_id), "user_id": user_id, "items": {"$exists": False}},
+            {"$inc": {"item_count": len(items)}, "$set": {"updated_at": now}},
+        )
+
+    async def pull_expense(self, user_id: str, expense_id: str) -> dict[str, int]:
+        """
+        Removes the items one expense contributed and returns how many were
+        removed per category.
+        """
+        removed: dict[str, int] = {}
+        query = {"user_id": user_id, "items.expense_id": expense_id}
+        async for bucket in self.col.find(query, projection={"category_id": 1, "items.expense_id": 1}):
+            count = sum(1 for it in bucket.get("items") or [] if it.get("expense_id") == expense_id)
+            removed[bucket["category_id"]] = removed.get(bucket["category_id"], 0) + count
+        if not removed:
+            return removed
+        now = datetime.now()
+        await self.col.update_many(query, {"$pull": {"items": {"expense_id": expense_id}}, "$set": {"updated_at": now}})
+        await self.categories.bulk_write([
+            UpdateOne(
+                {"_id": ObjectId(category_id), "user_id": user_id, "items": {"$exists": False}},
+                {"$inc": {"item_count": -count}, "$set": {"updated_at": now}},
+            )
+            for category_id, count in removed.items()
+        ], ordered=False)
+        return removed
+
+    async def delete(self, user_id: str, category_id: str):
+        await self.col.delete_many({"user_id": user_id, "category_id": category_id})
+
+    async def load(self, user_id: str, category_ids: list[str]) -> dict[str, list[dict]]:
+        """
+        Returns all items of the given categories with one query.
+        """
+        loaded: dict[str, list[dict]] = {category_id: [] for category_id in category_ids}
+        if not category_ids:
+            return loaded
+        find = self.read_col.find(
+            {"user_id": user_id, "category_id": {"$in": category_ids}},
+            projection={"category_id": 1, "items": 1},
+        ).sort([("category_id", 1), ("seq", 1)])
+        async for bucket in find:
+            loaded[bucket["category_id"]].extend(bucket.get("items") or [])
+        return loaded
+
+    async def page(self, user_id: str, category_id: str, limit: int, cursor: str | None = None) -> dict:
+        """
+        Returns `{"items": [...], "next_cursor": ...}` with up to `limit`
+        items, reading only the buckets the page spans.
+        """
+        seq, skip = parse_item_cursor(cursor)
+        rows: list[dict] = []
+        next_cursor = None
+        find = self.read_col.find(
+            {"user_id": user_id, "category_id": category_id, "seq": {"$gte": seq}},
+            projection={"seq": 1, "items": 1},
+        ).sort("seq", 1).batch_size(2 + limit // self.bucket_size)
+        async for bucket in find:
+            items = bucket.get("items") or []
+            start = min(skip, len(items))
+            skip -= start
+            for index in range(start, len(items)):
+                if len(rows) == limit:
+                    next_cursor = encode_cursor(str(bucket["seq"]), str(index))
+                    break
+                rows.append(items[index])
+            if next_cursor is not None:
+                break
+        return {"items": rows, "next_cursor": next_cursor}
+
+    async def migrate_category(self, doc: dict) -> bool:
+        """
+        Moves the embedded items of one category into buckets. Returns False
+        when the category changed on every attempt (it stays embedded and a
+        later run picks it up).
+        """
+        user_id, category_id = doc["user_id"], str(doc["_id"])
+        for _ in range(MIGRATION_RETRIES):
+            items = doc.get("items") or []
+            if items:
+                await self.write_buckets(user_id, {category_id: items})
+            res = await self.categories.update_one(
+                {"_id": doc["_id"], "updated_at": doc.get("updated_at"), "items": {"$exists": True}},
+                {"$set": {"item_count": len(items)}, "$unset": {"items": ""}},
+            )
+            if res.matched_count:
+                return True
+            doc = await self.categories.find_one({"_id": doc["_id"]})
+            if doc is None or "items" not in doc:
+                # Deleted, or rewritten into buckets by another writer meanwhile.
+                if doc is None:
+                    await self.delete(user_id, category_id)
+                return True
+        return False
+
+    async def migrate(self, user_ids: list[str] | None = None, batch_size: int = 200) -> dict:
+        query: dict = {"items": {"$exists": True}}
+        if user_ids:
+            query["user_id"] = {"$in": user_ids}
+        report = {"categories": 0, "items": 0, "retry_later": []}
+        find = self.categories.find(query).batch_size(batch_size)
+        async for doc in find:
+            if not await self.migrate_category(doc):
+                report["retry_later"].append(str(doc["_id"]))
+                continue
+            report["categories"] += 1
+            report["items"] += len(doc.get("items") or [])
+            if report["categories"] % batch_size == 0:
+                self.logger.info("Migrated %d categories to bucketed items", report["categories"])
+        return report
+
+    async def status(self) -> dict:
+        return {
+            "embedded": await self.categories.count_documents({"items": {"$exists": True}}),
+            "bucketed": await self.categories.count_documents({"items": {"$exists": False}}),
+            "buckets": await self.col.estimated_document_count(),
+        }
+
+
+def parse_item_cursor(cursor: str | None) -> tuple[int, int]:
+    if cursor is None:
+        return 0, 0
+    seq, skip = decode_cursor(cursor, 2)
+    if not (seq.isdigit() and skip.isdigit()):
+        raise ValueError("Invalid cursor")
+    return int(seq), int(skip)
+
+
+async def _main(args):
+    from db.database import close_client, get_db
+    from logging_utils import setup_logging
+
+    setup_logging("soa-category-budget")
+    store = CategoryItemStore(get_db())
+    try:
+        if args.command == "migrate":
+            print(json.dumps(await store.migrate(args.user, args.batch_size)))
+        else:
+            print(json.dumps(await store.status()))
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="count categories with embedded and bucketed items")
+    migrate = commands.add_parser("migrate", help="move embedded items into buckets")
+    migrate.add_argument("--user", action="append", help="only this user (repeatable); default all users")
+    migrate.add_argument("--batch-size", type=int, default=200)
+    asyncio.run(_main(parser.parse_args()))
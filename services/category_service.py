@@ -1,18 +1,97 @@
 import logging
 import os
 from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator
 from urllib.parse import urlparse
 from bson import ObjectId
-import requests
-from db.database import get_db
+from fastapi import BackgroundTasks
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from db.database import get_db, get_read_db
 from models.category_model import CategoryRequest
 from logging_utils import get_correlation_id
+from services.category_items import CategoryItemStore, parse_item_cursor
+from services.expense_cache import ExpenseCache
+from services.expense_client import ExpenseClient
+from services.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, paginate
+from services.user_versions import UserVersions, snapshot_digest
+
+BACKFILL_BATCH_SIZE = 500
+LISTING_BATCH_SIZE = 100
+
+
+def expense_id_of(expense: dict) -> str | None:
+    value = expense.get("expense_id") or expense.get("_id") or expense.get("id")
+    return str(value) if value is not None else None
+
+
+def tag_expense_items(expenses: Iterable[dict]) -> list[dict]:
+    """
+    Returns the expenses with each item stamped with its expense's id, so
+    expense events can later `$pull` exactly the items one expense
+    contributed. Expenses and items are copied; the input (possibly a cached
+    snapshot) is left untouched.
+    """
+    tagged = []
+    for exp in expenses:
+        expense_id = expense_id_of(exp) if isinstance(exp, dict) else None
+        if expense_id is None:
+            tagged.append(exp)
+            continue
+        items = [{**it, "expense_id": expense_id} if isinstance(it, dict) else it for it in exp.get("items") or []]
+        tagged.append({**exp, "items": items})
+    return tagged
+
+class ExpenseItemMerger:
+    """
+    Groups expense items by expense description in a single pass. Item dicts
+    are shared with the input, except that items without `created_at` are
+    copied before it is filled in, so a cached snapshot is never modified.
+    The cost is linear in the number of items. With `dedupe` enabled, items
+    repeating an `item_id` already seen under the same description are skipped.
+    """
+
+    def __init__(self, dedupe: bool = False):
+        self.dedupe = dedupe
+        self.now_iso = datetime.now().isoformat()
+
+    def iter_items(self, expenses: Iterable[dict], description: str | None = None) -> Iterator[tuple[str, dict]]:
+        """
+        Yields `(description, item)` pairs lazily, optionally only for one description.
+        """
+        seen: set[tuple[str, str]] = set()
+        for exp in expenses:
+            desc = (exp.get("description") or "").strip()
+            if not desc or (description is not None and desc != description):
+                continue
+            for it in exp.get("items") or []:
+                if isinstance(it, dict):
+                    if self.dedupe and it.get("item_id") is not None:
+                        key = (desc, it["item_id"])
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    if "created_at" not in it:
+                        it = {**it, "created_at": self.now_iso}
+                yield desc, it
+
+    def group(self, expenses: Iterable[dict]) -> dict[str, list[dict]]:
+        grouped: dict[str, list[dict]] = {}
+        for desc, it in self.iter_items(expenses):
+            bucket = grouped.get(desc)
+            if bucket is None:
+                bucket = grouped[desc] = []
+            bucket.append(it)
+        return grouped
+
 
 class CategoryService:
     def __init__(self):
         self.logger = logging.getLogger("soa-category-budget")
         self.db = get_db()
         self.col = self.db["category_data"]
+        # Listings read through MONGODB_READ_PREFERENCE; writes and write-path checks use self.col.
+        self.read_col = get_read_db()["category_data"]
         base = os.getenv("EXPENSE_SERVICE_URL", "http://soa-expense:8000").rstrip("/")
         parsed = urlparse(base)
         if parsed.port is None:
@@ -20,79 +99,115 @@ class CategoryService:
         self.expense_service_url = base
         self.expense_service_url_fallback = "http://localhost:8000"
         self.expense_service_internal = "http://soa-expense:8000"
+        self.expense_client = ExpenseClient([
+            self.expense_service_url,
+            self.expense_service_internal,
+            self.expense_service_url_fallback,
+        ])
+        self.expense_cache = ExpenseCache()
+        self.versions = UserVersions(self.db, get_read_db())
+        self.items = CategoryItemStore(self.db, get_read_db())
+        # When enabled, item backfills found while listing are written after the response is sent.
+        self.backfill_in_background = os.getenv("CATEGORY_BACKFILL_BACKGROUND", "false").lower() in ("1", "true", "yes")
+        self.dedupe_items = os.getenv("CATEGORY_DEDUPE_ITEMS", "false").lower() in ("1", "true", "yes")
+        self.backfill_stats = {"requests": 0, "requests_with_backfill": 0, "documents": 0, "max_per_request": 0}
+        # When enabled, items are maintained by the expense event consumer (services/expense_events.py)
+        # and listing categories never calls soa-expense.
+        self.items_from_events = os.getenv("CATEGORY_ITEMS_FROM_EVENTS", "false").lower() in ("1", "true", "yes")
+        # With EXPENSE_SYNC_MODE=incremental, listings merge only expenses newer than a per-user
+        # watermark into the stored items (services/expense_sync.py) instead of fetching everything.
+        self.expense_sync = None
+        if not self.items_from_events and os.getenv("EXPENSE_SYNC_MODE", "full").lower() == "incremental":
+            from services.expense_sync import ExpenseSync  # imports this module
+
+            self.expense_sync = ExpenseSync(self.db, self.expense_client)
         
     def _ensure_item_dates(self, raw_items: list[dict]) -> list[dict]:
         now_iso = datetime.now().isoformat()
-        out = []
         for it in raw_items or []:
             if isinstance(it, dict) and "created_at" not in it:
-                it = {**it, "created_at": now_iso}
-            out.append(it)
-        return out
+                it["created_at"] = now_iso
+        return raw_items or []
 
-    def _fetch_expenses(self, user_id: str) -> list[dict]:
-        urls: list[str] = []
-        for candidate in [
-            self.expense_service_url,
-            self.expense_service_internal,
-            self.expense_service_url_fallback
-        ]:
-            if candidate not in urls:
-                urls.append(candidate)
+    async def _load_expenses(self, user_id: str):
+        """
+        Cache loader: the expense list plus its digest, computed once per fill.
+        """
+        expenses = await self.expense_client.get_json(f"/{user_id}/expenses")
+        if expenses is None:
+            return None
+        if self.items_from_events:
+            expenses = tag_expense_items(expenses)
+        return {"expenses": expenses, "digest": snapshot_digest(expenses)}
 
-        for base in urls:
-            try:
-                target = f"{base}/{user_id}/expenses"
-                self.logger.info(
-                    "Fetching expenses",
-                    extra={
-                        "correlation_id": get_correlation_id(),
-                        "url": target,
-                        "method": "GET",
-                    },
-                )
-                resp = requests.get(target, timeout=5)
-                resp.raise_for_status()
-                payload = resp.json()
-                self.logger.info(
-                    "Fetched expenses successfully",
-                    extra={
-                        "correlation_id": get_correlation_id(),
-                        "url": target,
-                        "method": "GET",
-                        "status_code": resp.status_code,
-                    },
-                )
-                return payload
-            except requests.RequestException as exc:
-                self.logger.warning(
-                    "Failed to fetch expenses: %s", exc,
-                    extra={
-                        "correlation_id": get_correlation_id(),
-                        "url": target,
-                        "method": "GET",
-                    },
-                )
-                continue
-        self.logger.error(
-            "All expense fetch attempts failed",
-            extra={"correlation_id": get_correlation_id()},
+    async def _fetch_snapshot(self, user_id: str) -> tuple[list[dict], str]:
+        snapshot = await self.expense_cache.get_or_load(user_id, self._load_expenses)
+        if snapshot is None:
+            self.logger.error(
+                "All expense fetch attempts failed",
+                extra={"correlation_id": get_correlation_id()},
+            )
+            return [], ""
+        return snapshot["expenses"], snapshot["digest"]
+
+    async def _fetch_expenses(self, user_id: str) -> list[dict]:
+        expenses, _ = await self._fetch_snapshot(user_id)
+        return expenses
+
+    async def invalidate_expenses(self, user_id: str):
+        """
+        Drops the cached expense snapshot so the next read fetches fresh data.
+        Call it whenever the user's expenses are known to have changed.
+        """
+        await self.expense_cache.invalidate(user_id)
+        if self.expense_sync is not None:
+            self.expense_sync.forget(user_id)
+        elif not self.items_from_events:
+            # Listings backfill items from expenses, so they may change too.
+            await self.versions.bump(user_id, "categories")
+        self.logger.info(
+            "Expense cache invalidated",
+            extra={
+                "correlation_id": get_correlation_id(),
+                "path": f"/{user_id}/expenses/invalidate",
+            },
         )
-        return []
 
-    def create_category(self, user_id: str, payload: CategoryRequest) -> str:
+    async def sync_expenses(self, user_id: str):
+        """
+        Runs the incremental expense sync for `user_id` if enabled and due.
+        Called before a listing's ETag is computed, so merged expenses change it.
+        """
+        if self.expense_sync is not None:
+            await self.expense_sync.maybe_sync(user_id)
+
+    async def listing_snapshot(self, user_id: str) -> tuple[list[dict] | None, str]:
+        """
+        Prepares a categories listing before its ETag is computed. When items
+        are maintained locally (events or incremental sync) the stored items
+        are the whole state and `(None, "")` is returned. Otherwise the listing
+        backfills from the expense snapshot, so it is fetched here (through the
+        expense cache) and returned with the digest stored alongside it in the
+        cache, which goes into the ETag; pass the expenses on to
+        `iter_categories` / `get_categories`.
+        """
+        await self.sync_expenses(user_id)
+        if self.items_from_events or self.expense_sync is not None:
+            return None, ""
+        return await self._fetch_snapshot(user_id)
+
+    async def create_category(self, user_id: str, payload: CategoryRequest) -> str:
         name = payload.name.strip()
         if name == "":
             raise ValueError("Category name can not be empty")
 
-        exists = self.col.find_one({"user_id": user_id, "name": name})
+        exists = await self.col.find_one({"user_id": user_id, "name": name}, projection={"_id": 1})
         if exists:
             raise ValueError("Category with this name already exists")
 
         items: list[dict] = []
-        extra_categories: list[dict] = []
-        seen_extra_names: set[str] = set()
-        expenses = self._fetch_expenses(user_id)
+        extra_raw_items: dict[str, list[dict]] = {}
+        expenses = await self._fetch_expenses(user_id)
         self.logger.info(
             "Fetched expenses for category creation",
             extra={
@@ -118,11 +233,8 @@ class CategoryService:
             if desc == "":
                 continue
 
-            raw_items = exp.get("items", []) or []
-            raw_items = self._ensure_item_dates(raw_items)
-
             if desc == name:
-                items = raw_items
+                items = self._ensure_item_dates(exp.get("items", []) or [])
                 self.logger.info(
                     "Matched requested category with expenses",
                     extra={
@@ -131,38 +243,64 @@ class CategoryService:
                         "detail": f"name={name}, items={len(items)}",
                     },
                 )
-            else:
-                if desc in seen_extra_names:
-                    continue
-                seen_extra_names.add(desc)
-                exists_extra = self.col.find_one({"user_id": user_id, "name": desc})
-                if not exists_extra:
-                    self.logger.info(
-                        "Auto creating extra category from expense description",
-                        extra={
-                            "correlation_id": get_correlation_id(),
-                            "path": f"/{user_id}/categories/create",
-                            "detail": f"name={desc}, items={len(raw_items)}",
-                        },
-                    )
-                    extra_categories.append({
-                        "user_id": user_id,
-                        "name": desc,
-                        "items": raw_items,
-                        "created_at": now,
-                        "updated_at": now
-                    })
+            elif desc not in extra_raw_items:
+                extra_raw_items[desc] = exp.get("items", []) or []
+
+        # Resolve which descriptions already have a category in one query instead of one per name.
+        existing_names: set[str] = set()
+        if extra_raw_items:
+            async for d in self.col.find(
+                {"user_id": user_id, "name": {"$in": list(extra_raw_items)}},
+                projection={"_id": 0, "name": 1},
+            ):
+                existing_names.add(d["name"])
+
+        extra_categories: list[dict] = []
+        for desc, raw_items in extra_raw_items.items():
+            if desc in existing_names:
+                continue
+            raw_items = self._ensure_item_dates(raw_items)
+            self.logger.info(
+                "Auto creating extra category from expense description",
+                extra={
+                    "correlation_id": get_correlation_id(),
+                    "path": f"/{user_id}/categories/create",
+                    "detail": f"name={desc}, items={len(raw_items)}",
+                },
+            )
+            extra_categories.append(({
+                "_id": ObjectId(),
+                "user_id": user_id,
+                "name": desc,
+                "item_count": len(raw_items),
+                "created_at": now,
+                "updated_at": now
+            }, raw_items))
 
         doc = {
             "user_id": user_id,
             "name": name,
-            "items": items,
+            "item_count": len(items),
             "created_at": now,
             "updated_at": now
         }
-        res = self.col.insert_one(doc)
+        try:
+            res = await self.col.insert_one(doc)
+        except DuplicateKeyError:
+            raise ValueError("Category with this name already exists")
+        new_items = {str(res.inserted_id): items} if items else {}
         if extra_categories:
-            self.col.insert_many(extra_categories)
+            failed: set[int] = set()
+            try:
+                await self.col.insert_many([d for d, _ in extra_categories], ordered=False)
+            except BulkWriteError as e:
+                # Another request created some of the same names in the meantime.
+                failed = {w["index"] for w in e.details.get("writeErrors", [])}
+            for index, (extra, raw_items) in enumerate(extra_categories):
+                if index not in failed and raw_items:
+                    new_items[str(extra["_id"])] = raw_items
+        await self.items.write_buckets(user_id, new_items)
+        await self.versions.bump(user_id, "categories")
         self.logger.info(
             "Category created",
             extra={
@@ -178,16 +316,40 @@ class CategoryService:
             "items": items
         }
 
-    def get_categories(self, user_id: str):
-        expense_items_by_desc: dict[str, list[dict]] = {}
-        expenses = self._fetch_expenses(user_id)
-        for exp in expenses:
-            desc = exp.get("description", "").strip()
-            if desc:
-                current = expense_items_by_desc.get(desc, [])
-                raw_items = exp.get("items", []) or []
-                raw_items = self._ensure_item_dates(raw_items)
-                expense_items_by_desc[desc] = current + raw_items
+    async def iter_categories(
+        self,
+        user_id: str,
+        limit: int | None = None,
+        cursor: str | None = None,
+        background_tasks: BackgroundTasks | None = None,
+        include_items: bool = False,
+        expenses: list[dict] | None = None,
+    ) -> AsyncIterator[dict]:
+        """
+        Validates the request and fetches expenses up front, then returns an
+        async iterator that yields categories (ordered by name) straight from
+        the Mongo cursor. Names are unique per user, so `name` alone is the
+        keyset for `cursor`. Items are only loaded with `include_items`;
+        otherwise rows carry `item_count`. With CATEGORY_ITEMS_FROM_EVENTS or
+        the incremental expense sync the stored items are returned as-is and
+        soa-expense is not called here. `expenses` reuses a snapshot already
+        fetched by `listing_snapshot`.
+        """
+        query: dict = {"user_id": user_id}
+        if cursor is not None:
+            (after_name,) = decode_cursor(cursor, 1)
+            query["name"] = {"$gt": after_name}
+
+        projection = None if include_items else {"items": 0}
+        if self.items_from_events or self.expense_sync is not None:
+            find = self.read_col.find(query, projection=projection).sort("name", 1)
+            if limit is not None:
+                find = find.limit(limit)
+            return self._iter_category_docs(user_id, find, {}, background_tasks, include_items)
+
+        if expenses is None:
+            expenses = await self._fetch_expenses(user_id)
+        expense_items_by_desc = ExpenseItemMerger(self.dedupe_items).group(expenses)
         if not expenses:
             self.logger.warning(
                 "No expenses available when listing categories",
@@ -197,42 +359,175 @@ class CategoryService:
                 },
             )
 
-        docs = self.col.find({"user_id": user_id}).sort("name", 1)
-        out = []
-        for d in docs:
-            items = d.get("items", [])
-            if (not items) and d.get("name") in expense_items_by_desc:
-                items = expense_items_by_desc[d["name"]]
-                self.col.update_one(
-                    {"_id": d["_id"]},
-                    {"$set": {"items": items, "updated_at": datetime.now()}}
-                )
-            out.append({
-                "category_id": str(d["_id"]),
-                "name": d["name"],
-                "items": items,
-                "created_at": d["created_at"],
-                "updated_at": d["updated_at"],
-            })
-        return out
-
-    def update_category(self, user_id: str, category_id: str, payload: CategoryRequest):
+        find = self.read_col.find(query, projection=projection).sort("name", 1)
+        if limit is not None:
+            find = find.limit(limit)
+        return self._iter_category_docs(user_id, find, expense_items_by_desc, background_tasks, include_items)
+
+    async def _load_batch_items(self, user_id: str, batch: list[dict], include_items: bool):
+        """
+        Fills `items` on the documents of one listing batch that need them:
+        all of them with `include_items`, otherwise only documents that still
+        embed their items (no `item_count`), whose count is not stored yet.
+        """
+        embedded = [d["_id"] for d in batch if "item_count" not in d and "items" not in d]
+        if embedded:
+            async for d in self.read_col.find({"_id": {"$in": embedded}}, projection={"items": 1}):
+                inline = d.get("items") or []
+                for doc in batch:
+                    if doc["_id"] == d["_id"]:
+                        doc["items"] = inline
+        if include_items:
+            bucketed = [str(d["_id"]) for d in batch if "items" not in d]
+            loaded = await self.items.load(user_id, bucketed)
+            for d in batch:
+                if "items" not in d:
+                    d["items"] = loaded.get(str(d["_id"]), [])
+
+    async def _iter_category_docs(self, user_id, find, expense_items_by_desc, background_tasks, include_items=False):
+        backfills: dict[str, list[dict]] = {}
+        backfilled = 0
+        while batch := await find.to_list(LISTING_BATCH_SIZE):
+            await self._load_batch_items(user_id, batch, include_items)
+            for d in batch:
+                category_id = str(d["_id"])
+                items = d.get("items")
+                count = d["item_count"] if "item_count" in d else len(items or [])
+                if count == 0 and d.get("name") in expense_items_by_desc:
+                    items = expense_items_by_desc[d["name"]]
+                    count = len(items)
+                    backfills[category_id] = items
+                    if len(backfills) >= BACKFILL_BATCH_SIZE:
+                        backfilled += len(backfills)
+                        await self._flush_backfills(user_id, backfills, background_tasks)
+                        backfills = {}
+                row = {
+                    "category_id": category_id,
+                    "name": d["name"],
+                    "item_count": count,
+                    "created_at": d["created_at"],
+                    "updated_at": d["updated_at"],
+                }
+                if include_items:
+                    row["items"] = items or []
+                yield row
+
+        backfilled += len(backfills)
+        self._record_backfills(backfilled)
+        if backfills:
+            await self._flush_backfills(user_id, backfills, background_tasks)
+
+    async def get_categories(
+        self,
+        user_id: str,
+        background_tasks: BackgroundTasks | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        include_items: bool = False,
+        expenses: list[dict] | None = None,
+    ):
+        """
+        Without `limit`/`cursor` returns the full list (original response shape);
+        otherwise a page `{"items": [...], "next_cursor": ...}`.
+        """
+        if limit is None and cursor is None:
+            rows = await self.iter_categories(
+                user_id, background_tasks=background_tasks, include_items=include_items, expenses=expenses
+            )
+            return [c async for c in rows]
+
+        limit = limit or DEFAULT_PAGE_SIZE
+        rows = await self.iter_categories(user_id, limit + 1, cursor, background_tasks, include_items, expenses)
+        return paginate([c async for c in rows], limit, lambda c: (c["name"],))
+
+    async def get_category_items(self, user_id: str, category_id: str, limit: int | None = None, cursor: str | None = None):
+        """
+        Returns one page `{"items": [...], "next_cursor": ...}` of a
+        category's items in stored order.
+        """
+        limit = limit or DEFAULT_PAGE_SIZE
+        if not ObjectId.is_valid(category_id):
+            raise ValueError("Category not found")
+        doc = await self.read_col.find_one(
+            {"_id": ObjectId(category_id), "user_id": user_id}, projection={"items": 0}
+        )
+        if doc is None:
+            raise ValueError("Category not found")
+        if "item_count" in doc:
+            return await self.items.page(user_id, category_id, limit, cursor)
+
+        # Not migrated yet: page through the embedded array.
+        _, offset = parse_item_cursor(cursor)
+        doc = await self.read_col.find_one({"_id": doc["_id"]}, projection={"items": {"$slice": [offset, limit + 1]}})
+        items = (doc or {}).get("items") or []
+        next_cursor = encode_cursor("0", str(offset + limit)) if len(items) > limit else None
+        return {"items": items[:limit], "next_cursor": next_cursor}
+
+    async def _flush_backfills(self, user_id: str, items_by_category: dict[str, list[dict]], background_tasks: BackgroundTasks | None):
+        if background_tasks is not None and self.backfill_in_background:
+            background_tasks.add_task(self._write_backfills, user_id, items_by_category)
+        else:
+            await self._write_backfills(user_id, items_by_category)
+
+    def _record_backfills(self, count: int):
+        stats = self.backfill_stats
+        stats["requests"] += 1
+        if count:
+            stats["requests_with_backfill"] += 1
+            stats["documents"] += count
+            stats["max_per_request"] = max(stats["max_per_request"], count)
+
+    async def _write_backfills(self, user_id: str, items_by_category: dict[str, list[dict]]):
+        try:
+            await self.items.replace_many(user_id, items_by_category)
+        except PyMongoError as exc:
+            self.logger.error(
+                "Failed to backfill category items: %s", exc,
+                extra={
+                    "correlation_id": get_correlation_id(),
+                    "path": f"/{user_id}/categories",
+                },
+            )
+            return
+        await self.versions.bump(user_id, "categories")
+        self.logger.info(
+            "Backfilled category items",
+            extra={
+                "correlation_id": get_correlation_id(),
+                "path": f"/{user_id}/categories",
+                "detail": f"count={len(items_by_category)}",
+            },
+        )
+
+    async def update_category(self, user_id: str, category_id: str, payload: CategoryRequest):
         name = payload.name.strip()
         if name == "":
             raise ValueError("Category name can not be empty")
 
-        dup = self.col.find_one({"user_id": user_id, "name": name})
+        dup = await self.col.find_one({"user_id": user_id, "name": name}, projection={"_id": 1})
         if dup and str(dup["_id"]) != category_id:
             raise ValueError("Category with this name already exists")
 
-        res = self.col.update_one(
-            {"_id": ObjectId(category_id), "user_id": user_id},
-            {"$set": {"name": name, "updated_at": datetime.now()}}
-        )
-        if res.matched_count == 0:
+        try:
+            updated = await self.col.find_one_and_update(
+                {"_id": ObjectId(category_id), "user_id": user_id},
+                {"$set": {"name": name, "updated_at": datetime.now()}},
+                projection={"items": 0},
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            raise ValueError("Category with this name already exists")
+        if updated is None:
             raise ValueError("Category not found")
+        await self.versions.bump(user_id, "categories")
 
-        updated = self.col.find_one({"_id": ObjectId(category_id), "user_id": user_id})
+        if "item_count" in updated:
+            items = (await self.items.load(user_id, [category_id]))[category_id]
+        else:
+            # Not migrated to bucketed items yet; the items are still embedded.
+            inline = await self.col.find_one({"_id": updated["_id"]}, projection={"items": 1})
+            items = (inline or {}).get("items") or []
+            updated["item_count"] = len(items)
         self.logger.info(
             "Category updated",
             extra={
@@ -245,14 +540,17 @@ class CategoryService:
             "message": "Category updated successfully",
             "category_id": category_id,
             "name": updated["name"],
-            "items": updated.get("items", []),
+            "items": items,
+            "item_count": updated["item_count"],
             "updated_at": updated["updated_at"],
         }
 
-    def delete_category(self, user_id: str, category_id: str):
-        res = self.col.delete_one({"_id": ObjectId(category_id), "user_id": user_id})
+    async def delete_category(self, user_id: str, category_id: str):
+        res = await self.col.delete_one({"_id": ObjectId(category_id), "user_id": user_id})
         if res.deleted_count == 0:
             raise ValueError("Category not found")
+        await self.items.delete(user_id, category_id)
+        await self.versions.bump(user_id, "categories")
         self.logger.info(
             "Category deleted",
             extra={
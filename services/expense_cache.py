@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Protocol
+
+
+def _cache_config():
+    return {
+        "ttl_s": float(os.getenv("EXPENSE_CACHE_TTL_S", "30")),
+        "max_entries": int(os.getenv("EXPENSE_CACHE_MAX_ENTRIES", "1000")),
+        "max_bytes": int(os.getenv("EXPENSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    }
+
+
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[Any]: ...
+
+    async def set(self, key: str, value: Any, ttl: float) -> None: ...
+
+    async def delete(self, key: str) -> None: ...
+
+
+class InMemoryBackend:
+    """
+    Process-local LRU bounded by entry count and by an approximate byte budget
+    (size of the JSON encoding of each value). Expired entries are dropped on read.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes_used = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, value = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        self._pop(key)
+        self._entries[key] = (time.monotonic() + ttl, size, value)
+        self.bytes_used += size
+        while len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._pop(oldest)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        self._pop(key)
+
+    def _pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes_used -= entry[1]
+
+
+class RedisBackend:
+    """
+    Shared backend for multiple workers. Takes an already configured asyncio
+    Redis client (e.g. `redis.asyncio.Redis`); values are stored as JSON.
+    """
+
+    def __init__(self, redis, prefix: str = "expense-cache:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self.redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self.redis.set(self.prefix + key, json.dumps(value, default=str), px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self.redis.delete(self.prefix + key)
+
+
+class ExpenseCache:
+    """
+    Read-through cache of the parsed expense payload, keyed by user_id.
+    Concurrent misses for the same user share a single load. Failed loads
+    (loader returned None) are not cached.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: Optional[float] = None):
+        cfg = _cache_config()
+        if backend is None:
+            backend = InMemoryBackend(cfg["max_entries"], cfg["max_bytes"])
+        self.backend = backend
+        self.ttl = cfg["ttl_s"] if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+
+    async def get_or_load(
+        self, user_id: str, loader: Callable[[str], Awaitable[Optional[Any]]]
+    ) -> Optional[Any]:
+        if self.ttl <= 0:
+            return await loader(user_id)
+
+        cached = await self.backend.get(user_id)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        task = self._inflight.get(user_id)
+        if task is None:
+            # The load runs as its own task so cancelling whichever request
+            # started it does not cancel the requests waiting on the result.
+            task = asyncio.get_running_loop().create_task(self._load(user_id, loader))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda t: self._load_done(user_id, t))
+        return await asyncio.shield(task)
+
+    async def _load(self, user_id: str, loader: Callable[[str], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        value = await loader(user_id)
+        if value is not None and self._inflight.get(user_id) is asyncio.current_task():
+            await self.backend.set(user_id, value, self.ttl)
+        return value
+
+    def _load_done(self, user_id: str, task: asyncio.Task) -> None:
+        if self._inflight.get(user_id) is task:
+            del self._inflight[user_id]
+        # Waiters re-raise it; avoid "exception was never retrieved" when there are none.
+        if not task.cancelled():
+            task.exception()
+
+    async def invalidate(self, user_id: str) -> None:
+        self.invalidations += 1
+        # A load that started before the invalidation must not repopulate the cache.
+        self._inflight.pop(user_id, None)
+        await self.backend.delete(user_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        out = {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+        if isinstance(self.backend, InMemoryBackend):
+            out.update({
+                "entries": len(self.backend),
+                "bytes": self.backend.bytes_used,
+                "evictions": self.backend.evictions,
+            })
+        return out
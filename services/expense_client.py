@@ -0,0 +1,230 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Optional
+
+import httpx
+
+from logging_utils import get_correlation_id
+from metrics import EXPENSE_FETCH_LATENCY
+
+_FETCH_ERRORS = (httpx.HTTPError, ValueError)
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _http_config():
+    return {
+        "timeout": float(os.getenv("EXPENSE_HTTP_TIMEOUT", "5")),
+        "connect_timeout": float(os.getenv("EXPENSE_HTTP_CONNECT_TIMEOUT", "2")),
+        "max_connections": int(os.getenv("EXPENSE_HTTP_MAX_CONNECTIONS", "100")),
+        "max_keepalive": int(os.getenv("EXPENSE_HTTP_MAX_KEEPALIVE", "20")),
+        "keepalive_expiry": float(os.getenv("EXPENSE_HTTP_KEEPALIVE_EXPIRY", "30")),
+        "breaker_failures": int(os.getenv("EXPENSE_BREAKER_FAILURES", "3")),
+        "breaker_reset_s": float(os.getenv("EXPENSE_BREAKER_RESET_S", "30")),
+        "hedge_delay_s": float(os.getenv("EXPENSE_HEDGE_DELAY_S", "0.2")),
+    }
+
+
+def _is_client_error(exc: BaseException) -> bool:
+    # A 4xx is soa-expense answering, not soa-expense being down.
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code < 500
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the process-wide keep-alive client used for calls to soa-expense.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        cfg = _http_config()
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(cfg["timeout"], connect=cfg["connect_timeout"]),
+            limits=httpx.Limits(
+                max_connections=cfg["max_connections"],
+                max_keepalive_connections=cfg["max_keepalive"],
+                keepalive_expiry=cfg["keepalive_expiry"],
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures. Once `reset_timeout`
+    seconds have passed a single probe call is let through (half-open); its
+    outcome closes the breaker or keeps it open for another period.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # Call was abandoned (e.g. lost a race) without an outcome.
+        self._probe_in_flight = False
+
+
+class ExpenseClient:
+    """
+    Fetches JSON from soa-expense over the shared pooled client.
+
+    The last base URL that answered is remembered and tried first; if it fails
+    (or none is known yet) the remaining candidates are tried in order, each
+    one hedged by the next after `EXPENSE_HEDGE_DELAY_S` or as soon as it
+    fails, and the first successful response wins. Each base URL has its own
+    circuit breaker, so an unhealthy endpoint is skipped without waiting for a
+    timeout. Only transport errors, timeouts and 5xx responses count against
+    the breaker; a 4xx is an answer and is not retried elsewhere.
+    """
+
+    def __init__(self, candidates: list[str]):
+        self.logger = logging.getLogger("soa-category-budget")
+        cfg = _http_config()
+        self.candidates: list[str] = []
+        for candidate in candidates:
+            if candidate not in self.candidates:
+                self.candidates.append(candidate)
+        self.breakers = {
+            base: CircuitBreaker(cfg["breaker_failures"], cfg["breaker_reset_s"])
+            for base in self.candidates
+        }
+        self.preferred: Optional[str] = None
+        self.hedge_delay = cfg["hedge_delay_s"]
+
+    async def _get(self, base: str, path: str, timeout: Optional[float]) -> tuple[Any, int]:
+        target = f"{base}{path}"
+        breaker = self.breakers[base]
+        self.logger.info(
+            "Fetching expenses",
+            extra={"correlation_id": get_correlation_id(), "url": target, "method": "GET"},
+        )
+        start = time.perf_counter()
+        try:
+            kwargs = {"timeout": timeout} if timeout is not None else {}
+            resp = await get_http_client().get(target, **kwargs)
+            resp.raise_for_status()
+            payload = resp.json()
+        except asyncio.CancelledError:
+            breaker.release()
+            EXPENSE_FETCH_LATENCY.labels(base, "cancelled").observe(time.perf_counter() - start)
+            raise
+        except _FETCH_ERRORS as exc:
+            if _is_client_error(exc):
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+            EXPENSE_FETCH_LATENCY.labels(base, "error").observe(time.perf_counter() - start)
+            self.logger.warning(
+                "Failed to fetch expenses: %s", exc,
+                extra={"correlation_id": get_correlation_id(), "url": target, "method": "GET"},
+            )
+            raise
+        breaker.record_success()
+        EXPENSE_FETCH_LATENCY.labels(base, "success").observe(time.perf_counter() - start)
+        self.logger.info(
+            "Fetched expenses successfully",
+            extra={
+                "correlation_id": get_correlation_id(),
+                "url": target,
+                "method": "GET",
+                "status_code": resp.status_code,
+            },
+        )
+        return payload, len(resp.content)
+
+    async def _race(self, bases: list[str], path: str, timeout: Optional[float]) -> Optional[tuple[Any, int]]:
+        queue = list(bases)
+        tasks: dict[asyncio.Task, str] = {}
+        pending: set[asyncio.Task] = set()
+        try:
+            while True:
+                while queue:
+                    base = queue.pop(0)
+                    if self.breakers[base].allow():
+                        task = asyncio.create_task(self._get(base, path, timeout))
+                        tasks[task] = base
+                        pending.add(task)
+                        break
+                if not pending:
+                    return None
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_delay if queue else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                outcomes = [(task, task.exception()) for task in done]
+                for task, exc in outcomes:
+                    if exc is None:
+                        self.preferred = tasks[task]
+                        return task.result()
+                for task, exc in outcomes:
+                    if _is_client_error(exc):
+                        self.preferred = tasks[task]
+                        return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def get_json(self, path: str, timeout: Optional[float] = None) -> Any:
+        """
+        Returns the decoded JSON body for `path`, or None if soa-expense
+        answered with a 4xx or every endpoint failed or is short-circuited.
+        """
+        result = await self.fetch(path, timeout)
+        return result[0] if result is not None else None
+
+    async def fetch(self, path: str, timeout: Optional[float] = None) -> Optional[tuple[Any, int]]:
+        """
+        Like get_json, but returns `(payload, response size in bytes)`.
+        """
+        preferred = self.preferred
+        if preferred is not None and self.breakers[preferred].allow():
+            try:
+                return await self._get(preferred, path, timeout)
+            except _FETCH_ERRORS as exc:
+                if _is_client_error(exc):
+                    return None
+                self.preferred = None
+
+        others = [base for base in self.candidates if base != preferred]
+        return await self._race(others, path, timeout)
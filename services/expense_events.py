@@ -0,0 +1,405 @@
+"""
+Keeps category items up to date from soa-expense events instead of pulling
+the user's full expense list on every read.
+
+soa-expense publishes JSON events to a topic exchange with routing keys
+`expense.created`, `expense.updated` and `expense.deleted`:
+
+    {"type": "expense.updated", "user_id": "...", "expense_id": "...",
+     "version": 7, "expense": {"description": "...", "items": [...]}}
+
+Each event is applied with targeted updates: the expense's previous items are
+`$pull`ed from whichever category bucket holds them (items carry `expense_id`,
+see services/category_items.py) and the new ones appended to the category
+named after the description. Categories that still embed their items are
+updated in place.
+
+Ordering and idempotency: the `version` per expense is kept in
+`expense_event_state`. Before an event is applied it claims its version with
+one conditional update (only while the stored version is lower, or equal and
+not yet applied), so an event at or below an applied version is skipped even
+if it is redelivered concurrently. Applying the same event twice yields the
+same document (pull, then push), which makes retrying a claimed but failed
+event safe. Events without a `version` are always applied. Run a single
+consumer per queue so events for one expense are handled in publish order.
+
+Failures: an event that fails to apply is retried in place (keeping the queue
+order) up to EXPENSE_EVENTS_MAX_ATTEMPTS times, EXPENSE_EVENTS_RETRY_DELAY_S
+apart; errors that cannot succeed on retry (invalid ids, bad field types) are
+not retried. The message is then published to the dead-letter queue
+EXPENSE_EVENTS_DEAD_LETTER_QUEUE (with the error in its headers) and acked,
+so one poison message does not block the queue.
+
+    python -m services.expense_events consume
+    python -m services.expense_events rebuild [--user USER_ID ...]
+    python -m services.expense_events replay events.ndjson
+
+`rebuild` re-reads expenses over HTTP and rewrites every category's items
+(stop the consumer meanwhile); use it after an outage or when switching
+CATEGORY_ITEMS_FROM_EVENTS on. `replay` applies events from an NDJSON file,
+e.g. a dead-letter dump, in file order.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+import pika
+from bson.errors import BSONError
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from services.category_items import CategoryItemStore
+from services.category_service import (
+    BACKFILL_BATCH_SIZE,
+    ExpenseItemMerger,
+    expense_id_of,
+    tag_expense_items,
+)
+from services.user_versions import UserVersions
+
+STATE_COLLECTION = "expense_event_state"
+EVENT_TYPES = ("created", "updated", "deleted")
+
+
+def _events_config():
+    return {
+        "host": os.getenv("RABBITMQ_HOST", "localhost"),
+        "port": int(os.getenv("RABBITMQ_PORT", "5672")),
+        "user": os.getenv("RABBITMQ_USER", "guest"),
+        "password": os.getenv("RABBITMQ_PASSWORD", "guest"),
+        "exchange": os.getenv("EXPENSE_EVENTS_EXCHANGE", "expense-events"),
+        "queue": os.getenv("EXPENSE_EVENTS_QUEUE", "soa-category-budget.expense-events"),
+        "routing_key": os.getenv("EXPENSE_EVENTS_ROUTING_KEY", "expense.*"),
+        "prefetch": int(os.getenv("EXPENSE_EVENTS_PREFETCH", "50")),
+        "retry_delay": float(os.getenv("EXPENSE_EVENTS_RETRY_DELAY_S", "5")),
+        "max_attempts": int(os.getenv("EXPENSE_EVENTS_MAX_ATTEMPTS", "5")),
+        "dead_letter_queue": os.getenv(
+            "EXPENSE_EVENTS_DEAD_LETTER_QUEUE", "soa-category-budget.expense-events.dead-letter"
+        ),
+    }
+
+
+# Raised by malformed-but-parseable events; retrying them cannot succeed.
+PERMANENT_ERRORS = (BSONError, TypeError, ValueError, KeyError, AttributeError)
+
+
+def _event_type(event: dict, routing_key: str | None = None) -> str | None:
+    kind = event.get("type") or event.get("event") or routing_key or ""
+    kind = kind.rsplit(".", 1)[-1]
+    return kind if kind in EVENT_TYPES else None
+
+
+class ExpenseItemProjector:
+    """
+    Applies expense events and full rebuilds to category items.
+    `on_change(user_id)` runs after every applied event (the API wires it to
+    CategoryService.invalidate_expenses).
+    """
+
+    def __init__(self, db, expense_client=None, on_change: Optional[Callable[[str], Awaitable]] = None):
+        self.logger = logging.getLogger("soa-category-budget")
+        self.col = db["category_data"]
+        self.state = db[STATE_COLLECTION]
+        self.versions = UserVersions(db)
+        self.items = CategoryItemStore(db)
+        self.expense_client = expense_client
+        self.on_change = on_change
+        self.dedupe_items = os.getenv("CATEGORY_DEDUPE_ITEMS", "false").lower() in ("1", "true", "yes")
+        self.stats = {"applied": 0, "stale": 0, "ignored": 0}
+
+    async def apply(self, event: dict, routing_key: str | None = None) -> str:
+        """
+        Applies one event and returns "applied", "stale" (already applied or
+        superseded) or "ignored" (malformed).
+        """
+        kind = _event_type(event, routing_key)
+        user_id = event.get("user_id")
+        expense = event.get("expense") or {}
+        expense_id = event.get("expense_id") or expense_id_of(expense)
+        if kind is None or not user_id or expense_id is None:
+            self.stats["ignored"] += 1
+            self.logger.warning("Ignoring malformed expense event: %s", event)
+            return "ignored"
+        expense_id = str(expense_id)
+        version = event.get("version")
+        state_id = f"{user_id}:{expense_id}"
+
+        now = datetime.now()
+        if version is not None and not await self._claim(state_id, version, kind, now):
+            self.stats["stale"] += 1
+            return "stale"
+
+        # Categories not migrated to buckets yet keep their items inline.
+        await self.col.update_many(
+            {"user_id": user_id, "items.expense_id": expense_id},
+            {"$pull": {"items": {"expense_id": expense_id}}, "$set": {"updated_at": now}},
+        )
+        await self.items.pull_expense(user_id, expense_id)
+        if kind != "deleted":
+            [expense] = tag_expense_items([{**expense, "expense_id": expense_id}])
+            items = [it for _, it in ExpenseItemMerger(self.dedupe_items).iter_items([expense])]
+            description = (expense.get("description") or "").strip()
+            if items:
+                res = await self.col.update_one(
+                    {"user_id": user_id, "name": description, "items": {"$exists": True}},
+                    {"$push": {"items": {"$each": items}}, "$set": {"updated_at": now}},
+                )
+                if res.matched_count == 0:
+                    category = await self.col.find_one({"user_id": user_id, "name": description}, projection={"_id": 1})
+                    if category is not None:
+                        await self.items.append(user_id, str(category["_id"]), items)
+        if version is not None:
+            await self.state.update_one({"_id": state_id, "version": version}, {"$set": {"applied": True}})
+
+        await self.versions.bump(user_id, "categories")
+        self.stats["applied"] += 1
+        if self.on_change is not None:
+            await self.on_change(user_id)
+        self.logger.info(
+            "Applied expense event",
+            extra={"path": f"/{user_id}/categories", "detail": f"{kind} expense_id={expense_id}"},
+        )
+        return "applied"
+
+    async def _claim(self, state_id: str, version, kind: str, now: datetime) -> bool:
+        """
+        Records `version` as the expense's current one unless a version at or
+        above it was already applied (or a higher one claimed). A claim that is
+        not marked `applied` can be taken again by a retry of the same event.
+        """
+        try:
+            await self.state.update_one(
+                {"_id": state_id, "$or": [{"version": {"$lt": version}}, {"version": version, "applied": False}]},
+                {"$set": {"version": version, "applied": False, "deleted": kind == "deleted", "updated_at": now}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The state exists but did not match: the event is stale.
+            return False
+        return True
+
+    async def rebuild_user(self, user_id: str, expenses: list[dict] | None = None) -> int:
+        """
+        Rewrites the items of every category of `user_id` from a fresh
+        expense list (fetched unless given) and returns the number of
+        categories written.
+        """
+        if expenses is None:
+            expenses = await self.expense_client.get_json(f"/{user_id}/expenses")
+        if expenses is None:
+            raise RuntimeError(f"Could not fetch expenses for user {user_id}")
+        grouped = ExpenseItemMerger(self.dedupe_items).group(tag_expense_items(expenses))
+
+        now = datetime.now()
+        batch: dict[str, list[dict]] = {}
+        written = 0
+        async for d in self.col.find({"user_id": user_id}, projection={"name": 1}):
+            batch[str(d["_id"])] = grouped.get(d["name"], [])
+            if len(batch) >= BACKFILL_BATCH_SIZE:
+                await self.items.replace_many(user_id, batch)
+                written += len(batch)
+                batch = {}
+        if batch:
+            await self.items.replace_many(user_id, batch)
+            written += len(batch)
+
+        state_ops = [
+            UpdateOne(
+                {"_id": f"{user_id}:{expense_id_of(exp)}"},
+                {"$max": {"version": exp["version"]}, "$set": {"applied": True, "deleted": False, "updated_at": now}},
+                upsert=True,
+            )
+            for exp in expenses
+            if expense_id_of(exp) is not None and exp.get("version") is not None
+        ]
+        if state_ops:
+            await self.state.bulk_write(state_ops, ordered=False)
+        await self.versions.bump(user_id, "categories")
+        if self.on_change is not None:
+            await self.on_change(user_id)
+        return written
+
+    async def rebuild(self, user_ids: list[str] | None = None) -> dict:
+        if not user_ids:
+            user_ids = await self.col.distinct("user_id")
+        report = {"users": 0, "categories": 0, "failed": []}
+        for user_id in user_ids:
+            try:
+                report["categories"] += await self.rebuild_user(user_id)
+                report["users"] += 1
+            except Exception as exc:
+                self.logger.error("Failed to rebuild category items for %s: %s", user_id, exc)
+                report["failed"].append(user_id)
+        return report
+
+
+class ExpenseEventConsumer:
+    """
+    Consumes expense events on a background thread with a blocking pika
+    connection and applies them one at a time on `loop` (the loop that owns
+    the Mongo client). A message is acked only after it was applied or
+    dead-lettered; the consumer reconnects after RabbitMQ errors.
+
+    The queue is consumed exclusively, so however many processes start a
+    consumer (API workers, standalone consumers) only one receives events;
+    the others stand by and take over once it disconnects.
+    """
+
+    def __init__(self, projector: ExpenseItemProjector, loop: asyncio.AbstractEventLoop):
+        self.logger = logging.getLogger("soa-category-budget")
+        self.projector = projector
+        self.loop = loop
+        cfg = _events_config()
+        self.exchange = cfg["exchange"]
+        self.queue = cfg["queue"]
+        self.routing_key = cfg["routing_key"]
+        self.prefetch = cfg["prefetch"]
+        self.retry_delay = cfg["retry_delay"]
+        self.max_attempts = max(1, cfg["max_attempts"])
+        self.dead_letter_queue = cfg["dead_letter_queue"]
+        self.stats = {"retries": 0, "dead_lettered": 0}
+        self.connection_params = pika.ConnectionParameters(
+            host=cfg["host"],
+            port=cfg["port"],
+            credentials=pika.PlainCredentials(cfg["user"], cfg["password"]),
+            heartbeat=30,
+        )
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="expense-event-consumer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                self._consume()
+            except pika.exceptions.ChannelClosedByBroker as exc:
+                if exc.reply_code == 403:
+                    self.logger.info("Expense event queue is consumed elsewhere, standing by")
+                else:
+                    self.logger.warning("Expense event consumer disconnected: %s", exc)
+                self._stop.wait(self.retry_delay)
+            except pika.exceptions.AMQPError as exc:
+                self.logger.warning("Expense event consumer disconnected: %s", exc)
+                self._stop.wait(self.retry_delay)
+
+    def _consume(self):
+        connection = pika.BlockingConnection(self.connection_params)
+        try:
+            channel = connection.channel()
+            channel.exchange_declare(exchange=self.exchange, exchange_type="topic", durable=True)
+            channel.queue_declare(queue=self.queue, durable=True)
+            channel.queue_bind(queue=self.queue, exchange=self.exchange, routing_key=self.routing_key)
+            channel.queue_declare(queue=self.dead_letter_queue, durable=True)
+            # Dead-lettered messages are acked only once the broker confirmed their copy.
+            channel.confirm_delivery()
+            channel.basic_qos(prefetch_count=self.prefetch)
+            for method, _, body in channel.consume(self.queue, exclusive=True, inactivity_timeout=1):
+                if self._stop.is_set():
+                    break
+                if method is not None:
+                    self._handle(channel, method, body)
+            channel.cancel()
+        finally:
+            if connection.is_open:
+                connection.close()
+
+    def _handle(self, channel, method, body: bytes):
+        try:
+            event = json.loads(body)
+        except ValueError as exc:
+            self._dead_letter(channel, method, body, f"undecodable: {exc}", 0)
+            return
+        for attempt in range(1, self.max_attempts + 1):
+            future = asyncio.run_coroutine_threadsafe(
+                self.projector.apply(event, method.routing_key), self.loop
+            )
+            try:
+                future.result()
+            except PERMANENT_ERRORS as exc:
+                self._dead_letter(channel, method, body, repr(exc), attempt)
+                return
+            except Exception as exc:
+                if attempt == self.max_attempts or self._stop.is_set():
+                    if self._stop.is_set():
+                        # Shutting down: leave it to the next consumer, in order.
+                        channel.basic_nack(method.delivery_tag, requeue=True)
+                    else:
+                        self._dead_letter(channel, method, body, repr(exc), attempt)
+                    return
+                self.stats["retries"] += 1
+                self.logger.warning(
+                    "Failed to apply expense event (attempt %d/%d), retrying: %s", attempt, self.max_attempts, exc
+                )
+                self._stop.wait(self.retry_delay)
+                continue
+            channel.basic_ack(method.delivery_tag)
+            return
+
+    def _dead_letter(self, channel, method, body: bytes, error: str, attempts: int):
+        self.logger.error(
+            "Dead-lettering expense event after %d attempt(s): %s", attempts, error,
+            extra={"detail": f"routing_key={method.routing_key} queue={self.dead_letter_queue}"},
+        )
+        channel.basic_publish(
+            exchange="",
+            routing_key=self.dead_letter_queue,
+            body=body,
+            properties=pika.BasicProperties(
+                delivery_mode=2,
+                content_type="application/json",
+                headers={"x-error": error[:1000], "x-attempts": attempts, "x-routing-key": method.routing_key},
+            ),
+        )
+        channel.basic_ack(method.delivery_tag)
+        self.stats["dead_lettered"] += 1
+
+
+async def _main(args):
+    from db.database import close_client, get_db
+    from logging_utils import setup_logging
+    from services.category_service import CategoryService
+
+    setup_logging("soa-category-budget")
+    service = CategoryService()
+    projector = ExpenseItemProjector(get_db(), service.expense_client)
+    try:
+        if args.command == "rebuild":
+            print(json.dumps(await projector.rebuild(args.user)))
+        elif args.command == "replay":
+            with open(args.file, encoding="utf-8") as fh:
+                for line in fh:
+                    if line.strip():
+                        await projector.apply(json.loads(line))
+            print(json.dumps(projector.stats))
+        else:
+            consumer = ExpenseEventConsumer(projector, asyncio.get_running_loop())
+            try:
+                await asyncio.to_thread(consumer.run)
+            finally:
+                consumer.stop()
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("consume", help="apply events from RabbitMQ until interrupted")
+    rebuild = commands.add_parser("rebuild", help="rewrite category items from soa-expense")
+    rebuild.add_argument("--user", action="append", help="only this user (repeatable); default all users")
+    replay = commands.add_parser("replay", help="apply events from an NDJSON file in order")
+    replay.add_argument("file")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,290 @@
+"""
+Incremental expense sync for category items (EXPENSE_SYNC_MODE=incremental).
+
+Instead of downloading a user's whole expense history on every listing, the
+service keeps a per-user watermark in `expense_sync_state`: the largest value
+of EXPENSE_SYNC_WATERMARK_FIELD (default `created_at`; an ISO timestamp or a
+monotonically increasing expense id) seen so far. A sync then asks for
+
+    GET /{user_id}/expenses?since=<watermark>
+
+and merges only the expenses at or above the watermark into the categories named
+after their description, the same way an `expense.updated` event is applied
+(services/expense_events.py). An endpoint that ignores `since` still works:
+the full list is filtered locally, it just transfers more bytes, which shows
+up in `expense_sync_bytes{mode="delta"}`.
+
+Watermark values are compared typed: numbers as numbers, anything else as a
+timestamp (ISO strings with `Z`, offsets or any number of fractional digits
+are parsed to UTC and truncated to milliseconds, the precision Mongo stores).
+The state keeps the watermark as a BSON number or date, together with the ids
+of the expenses that carry exactly that value. `since` is inclusive, so
+expenses that share the watermark but arrived after the last sync are still
+merged, and the stored ids keep the ones already merged from being applied
+twice.
+
+A delta cannot see deleted or back-dated expenses, so the first sync of a
+user and every sync after EXPENSE_SYNC_FULL_INTERVAL_S is a full resync that
+rewrites the user's items from the complete list.
+
+    python -m services.expense_sync --user USER_ID [--full]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+from logging_utils import get_correlation_id
+from metrics import EXPENSE_SYNC_BYTES, EXPENSE_SYNC_ITEMS
+from services.category_service import expense_id_of
+from services.expense_events import ExpenseItemProjector
+
+STATE_COLLECTION = "expense_sync_state"
+
+
+def _sync_config():
+    return {
+        "interval_s": float(os.getenv("EXPENSE_SYNC_INTERVAL_S", "30")),
+        "full_interval_s": float(os.getenv("EXPENSE_SYNC_FULL_INTERVAL_S", "86400")),
+        "since_param": os.getenv("EXPENSE_SYNC_SINCE_PARAM", "since"),
+        "watermark_field": os.getenv("EXPENSE_SYNC_WATERMARK_FIELD", "created_at"),
+        "max_users": int(os.getenv("EXPENSE_SYNC_MAX_USERS", "10000")),
+    }
+
+
+def watermark_value(raw):
+    """
+    Typed, comparable form of a watermark field value: an int/float, a UTC
+    datetime truncated to milliseconds, or None when it is neither.
+    """
+    if isinstance(raw, bool) or raw is None:
+        return None
+    if isinstance(raw, (int, float)):
+        return raw
+    if isinstance(raw, str):
+        text = raw.strip()
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        try:
+            return float(text) if text.replace(".", "", 1).isdigit() else watermark_value(datetime.fromisoformat(text))
+        except ValueError:
+            return None
+    if isinstance(raw, datetime):
+        if raw.tzinfo is None:
+            raw = raw.replace(tzinfo=timezone.utc)
+        raw = raw.astimezone(timezone.utc)
+        return raw.replace(microsecond=raw.microsecond // 1000 * 1000)
+    return None
+
+
+def _comparable(a, b) -> bool:
+    return isinstance(a, datetime) == isinstance(b, datetime)
+
+
+def _since_param(value) -> str:
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def _item_count(expenses: list[dict]) -> int:
+    return sum(len(exp.get("items") or []) for exp in expenses if isinstance(exp, dict))
+
+
+class ExpenseSync:
+    """
+    Brings a user's category items up to date with soa-expense, at most once
+    per EXPENSE_SYNC_INTERVAL_S per process (or on demand with `force`).
+    """
+
+    def __init__(self, db, expense_client):
+        self.logger = logging.getLogger("soa-category-budget")
+        cfg = _sync_config()
+        self.interval = cfg["interval_s"]
+        self.full_interval = timedelta(seconds=cfg["full_interval_s"])
+        self.since_param = cfg["since_param"]
+        self.watermark_field = cfg["watermark_field"]
+        self.max_users = cfg["max_users"]
+        self.state = db[STATE_COLLECTION]
+        self.expense_client = expense_client
+        self.projector = ExpenseItemProjector(db, expense_client)
+        self._synced_at: OrderedDict[str, float] = OrderedDict()
+        self.stats = {"delta_syncs": 0, "full_syncs": 0, "failures": 0, "bytes": 0, "items": 0, "merged": 0}
+
+    def forget(self, user_id: str):
+        """
+        Lets the next listing sync right away; call when expenses are known to have changed.
+        """
+        self._synced_at.pop(user_id, None)
+
+    def _value(self, expense) -> object:
+        return watermark_value(expense.get(self.watermark_field)) if isinstance(expense, dict) else None
+
+    def _watermark(self, expenses: list[dict], current=None, current_ids=()) -> tuple[object, list[str]]:
+        """
+        Returns the highest watermark value among `expenses` and `current`,
+        with the ids of the expenses that carry it. Values of another type
+        than the current watermark (e.g. a date among numeric ids) are ignored.
+        """
+        top, ids = current, set(current_ids) if current is not None else set()
+        for exp in expenses:
+            value = self._value(exp)
+            if value is None or (top is not None and not _comparable(value, top)):
+                continue
+            if top is None or value > top:
+                top, ids = value, set()
+            if value == top and expense_id_of(exp) is not None:
+                ids.add(expense_id_of(exp))
+        return top, sorted(ids)
+
+    async def maybe_sync(self, user_id: str, force: bool = False) -> str | None:
+        """
+        Syncs unless the user was synced within the interval. Returns the mode
+        used ("delta" or "full"), or None when skipped or soa-expense failed;
+        listings are then served from the stored items.
+        """
+        now = time.monotonic()
+        synced_at = self._synced_at.get(user_id)
+        if not force and synced_at is not None and now - synced_at < self.interval:
+            return None
+        # Claimed before the fetch so concurrent listings of the same user do not all sync.
+        self._synced_at[user_id] = now
+        self._synced_at.move_to_end(user_id)
+        while len(self._synced_at) > self.max_users:
+            self._synced_at.popitem(last=False)
+
+        state = await self.state.find_one({"_id": user_id}) or {}
+        full_due = state.get("full_sync_at") is None or datetime.now() - state["full_sync_at"] >= self.full_interval
+        # Watermarks stored as strings by earlier versions are parsed here and rewritten typed.
+        watermark = watermark_value(state.get("watermark"))
+        if full_due or watermark is None:
+            ok = await self.full_sync(user_id)
+            mode = "full"
+        else:
+            ok = await self.delta_sync(user_id, watermark, state.get("watermark_ids") or [], state.get("watermark"))
+            mode = "delta"
+        if not ok:
+            self.forget(user_id)
+            return None
+        return mode
+
+    async def _fetch(self, user_id: str, path: str, mode: str) -> list[dict] | None:
+        result = await self.expense_client.fetch(path)
+        if result is None or not isinstance(result[0], list):
+            self.stats["failures"] += 1
+            self.logger.warning(
+                "Expense sync failed, serving stored items",
+                extra={"correlation_id": get_correlation_id(), "path": f"/{user_id}/categories", "detail": f"mode={mode}"},
+            )
+            return None
+        expenses, size = result
+        items = _item_count(expenses)
+        EXPENSE_SYNC_BYTES.labels(mode).observe(size)
+        EXPENSE_SYNC_ITEMS.labels(mode).observe(items)
+        self.stats[f"{mode}_syncs"] += 1
+        self.stats["bytes"] += size
+        self.stats["items"] += items
+        return expenses
+
+    async def delta_sync(self, user_id: str, watermark, watermark_ids: list[str], stored=None) -> bool:
+        """
+        Merges the expenses at or above `watermark`, skipping `watermark_ids`
+        (already merged at exactly that value). `stored` is the watermark as
+        read from the state; the state only advances if it is still unchanged.
+        """
+        path = f"/{user_id}/expenses"
+        if self.since_param:
+            path += f"?{self.since_param}={quote(_since_param(watermark))}"
+        expenses = await self._fetch(user_id, path, "delta")
+        if expenses is None:
+            return False
+        # Filtered here as well, in case the endpoint does not support `since`.
+        seen = set(watermark_ids)
+        delta = []
+        for exp in expenses:
+            value = self._value(exp)
+            if value is None or not _comparable(value, watermark) or value < watermark:
+                continue
+            if value == watermark and expense_id_of(exp) in seen:
+                continue
+            delta.append(exp)
+        for exp in delta:
+            await self.projector.apply({
+                "type": "expense.updated",
+                "user_id": user_id,
+                "expense_id": expense_id_of(exp),
+                "version": exp.get("version"),
+                "expense": exp,
+            })
+        self.stats["merged"] += len(delta)
+        new_watermark, new_ids = self._watermark(delta, watermark, watermark_ids)
+        # Conditional on the watermark read before the fetch: a concurrent sync
+        # (another worker) that advanced it further is not rolled back.
+        await self.state.update_one(
+            {"_id": user_id, "watermark": stored if stored is not None else watermark},
+            {"$set": {"watermark": new_watermark, "watermark_ids": new_ids, "synced_at": datetime.now()}},
+        )
+        self.logger.info(
+            "Expense delta synced",
+            extra={
+                "correlation_id": get_correlation_id(),
+                "path": f"/{user_id}/categories",
+                "detail": f"received={len(expenses)} merged={len(delta)}",
+            },
+        )
+        return True
+
+    async def full_sync(self, user_id: str) -> bool:
+        expenses = await self._fetch(user_id, f"/{user_id}/expenses", "full")
+        if expenses is None:
+            return False
+        await self.projector.rebuild_user(user_id, expenses)
+        now = datetime.now()
+        watermark, watermark_ids = self._watermark(expenses)
+        await self.state.update_one(
+            {"_id": user_id},
+            {"$set": {
+                "watermark": watermark, "watermark_ids": watermark_ids, "synced_at": now, "full_sync_at": now,
+            }},
+            upsert=True,
+        )
+        self.logger.info(
+            "Expense full resync",
+            extra={
+                "correlation_id": get_correlation_id(),
+                "path": f"/{user_id}/categories",
+                "detail": f"expenses={len(expenses)}",
+            },
+        )
+        return True
+
+
+async def _main(args):
+    from db.database import close_client, get_db
+    from logging_utils import setup_logging
+    from services.category_service import CategoryService
+
+    setup_logging("soa-category-budget")
+    sync = ExpenseSync(get_db(), CategoryService().expense_client)
+    try:
+        report = {}
+        for user_id in args.user:
+            if args.full:
+                report[user_id] = "full" if await sync.full_sync(user_id) else None
+            else:
+                report[user_id] = await sync.maybe_sync(user_id, force=True)
+        print(json.dumps({"users": report, "stats": sync.stats}))
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", action="append", required=True, help="user to sync (repeatable)")
+    parser.add_argument("--full", action="store_true", help="full resync regardless of the watermark")
+    asyncio.run(_main(parser.parse_args()))
@@ -1,15 +1,73 @@
+import hashlib
 import jwt
 import os
+import time
+from collections import OrderedDict
 from typing import Dict, Optional
 
 class JWTService:
     def __init__(self):
         self.secret_key = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
         self.algorithm = "HS256"
+        # Verified-token cache: sha256(token) -> (expires_at, payload or None for invalid tokens)
+        self.cache_max_entries = int(os.getenv("JWT_CACHE_MAX_ENTRIES", "10000"))
+        self.cache_max_ttl = float(os.getenv("JWT_CACHE_MAX_TTL_S", "300"))
+        self.cache_negative_ttl = float(os.getenv("JWT_CACHE_NEGATIVE_TTL_S", "5"))
+        self._cache: OrderedDict[bytes, tuple[float, Optional[Dict]]] = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _decode(self, token: str) -> Optional[Dict]:
+        try:
+            return jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.ExpiredSignatureError:
+            return None
+        except jwt.InvalidTokenError:
+            return None
+
+    def _cached_decode(self, token: str) -> Optional[Dict]:
+        if self.cache_max_entries <= 0:
+            return self._decode(token)
+
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.time()
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            return entry[1]
+        self.cache_misses += 1
+
+        payload = self._decode(token)
+        if payload is None:
+            expires_at = now + self.cache_negative_ttl
+        else:
+            expires_at = now + self.cache_max_ttl
+            exp = payload.get("exp")
+            if isinstance(exp, (int, float)):
+                expires_at = min(expires_at, exp)
+        self._cache[key] = (expires_at, payload)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+        return payload
+
+    def cache_stats(self) -> Dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._cache),
+        }
 
     def verify_token(self, token: str, token_type: str = "access") -> Optional[Dict]:
         """
         Verifies a JWT token and returns the payload if valid.
+
+        Verified payloads are cached by token digest until the token's `exp`
+        (at most JWT_CACHE_MAX_TTL_S); invalid tokens are cached for
+        JWT_CACHE_NEGATIVE_TTL_S.
         
         Args:
             token: The JWT token string
@@ -18,16 +76,12 @@ class JWTService:
         Returns:
             Dictionary with token payload if valid, None otherwise
         """
-        try:
-            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            
-            # Verify token type matches
-            if payload.get("type") != token_type:
-                return None
-                
-            return payload
-        except jwt.ExpiredSignatureError:
+        payload = self._cached_decode(token)
+        if payload is None:
             return None
-        except jwt.InvalidTokenError:
+
+        # Verify token type matches
+        if payload.get("type") != token_type:
             return None
 
+        return payload
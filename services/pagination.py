@@ -0,0 +1,36 @@
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values: str) -> str:
+    """
+    Encodes the sort key of the last returned document as an opaque cursor.
+    """
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def paginate(rows: list[dict], limit: int, key) -> dict:
+    """
+    Builds a page from up to `limit + 1` rows; the extra row only signals that
+    another page exists.
+    """
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*key(rows[-1]))
+    return {"items": rows, "next_cursor": next_cursor}
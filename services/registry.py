@@ -0,0 +1,35 @@
+"""
+Per-process service instances. Services hold Mongo collection handles and
+in-memory caches, so each worker process builds its own on first use instead
+of inheriting the parent's across fork.
+"""
+import os
+from typing import Optional
+
+from services.budget_service import BudgetService
+from services.category_service import CategoryService
+
+_services: dict[str, object] = {}
+_services_pid: Optional[int] = None
+
+
+def _current() -> dict[str, object]:
+    global _services_pid
+    if _services_pid != os.getpid():
+        _services.clear()
+        _services_pid = os.getpid()
+    return _services
+
+
+def get_category_service() -> CategoryService:
+    services = _current()
+    if "category" not in services:
+        services["category"] = CategoryService()
+    return services["category"]
+
+
+def get_budget_service() -> BudgetService:
+    services = _current()
+    if "budget" not in services:
+        services["budget"] = BudgetService()
+    return services["budget"]
@@ -0,0 +1,64 @@
+import hashlib
+import json
+import zlib
+
+VERSIONS_COLLECTION = "user_versions"
+KINDS = ("categories", "budgets")
+
+
+class UserVersions:
+    """
+    Per-user change counters, one per listing ("categories", "budgets"),
+    bumped by every write that can change the listing. Reading one is a
+    single `_id` lookup, which makes it a cheap basis for ETags. Pass the
+    listings' read handle as `read_db` so versions follow the same read
+    preference as the listings they tag.
+    """
+
+    def __init__(self, db, read_db=None):
+        self.col = db[VERSIONS_COLLECTION]
+        self.read_col = (read_db if read_db is not None else db)[VERSIONS_COLLECTION]
+
+    async def get(self, user_id: str, kind: str) -> int:
+        doc = await self.read_col.find_one({"_id": user_id}, projection={kind: 1})
+        return (doc or {}).get(kind, 0)
+
+    async def bump(self, user_id: str, *kinds: str) -> None:
+        await self.col.update_one(
+            {"_id": user_id},
+            {"$inc": {kind: 1 for kind in kinds}},
+            upsert=True,
+        )
+
+
+def weak_etag(kind: str, version: int, variant: str = "") -> str:
+    """
+    Builds a weak ETag from a listing version; `variant` distinguishes
+    representations of the same listing (page, filter, media type).
+    """
+    return f'W/"{kind}-{version}-{zlib.crc32(variant.encode("utf-8")):08x}"'
+
+
+def snapshot_digest(payload) -> str:
+    """
+    Short digest of data a listing is derived from but that is not versioned
+    in `user_versions` (e.g. the expense snapshot the categories listing
+    backfills from), for use as part of an ETag variant. Computed once when
+    the data is loaded, not per request.
+    """
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Weak comparison against an If-None-Match header value.
+    """
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False